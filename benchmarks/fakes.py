@@ -0,0 +1,515 @@
+"""Local stand-ins for every service the pipeline talks to.
+
+- FakeDNSServer: authoritative UDP DNS answering MX, TXT, _dmarc TXT, NS and SOA
+- FakeWhoisServer: port-43 style WHOIS over TCP
+- FakeHTTPServer: email validation, IP intelligence, fakefilter feed, RDAP,
+  the Slack Web API and file upload, and the target websites
+
+Answers are derived from a hash of the domain name, so every run of the same
+domain list sees the same mix of dead domains, providers, SPF/DMARC policies
+and live sites. Each service takes a Behaviour with its latency, error rate and
+rate-limit (429) rate.
+"""
+import hashlib
+import json
+import random
+import socket
+import socketserver
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdatatype
+import dns.rrset
+
+TLDS = ["com", "net", "org", "io", "xyz"]
+
+MX_HOSTS = [
+    "aspmx.l.google.com",
+    "example-com.mail.protection.outlook.com",
+    "mx.zoho.com",
+    "mx1.privateemail.com",
+    "mail.protonmail.ch",
+    "mx.yandex.net",
+    "mx1.fakemail.test",
+]
+
+SPF_RECORDS = [
+    "v=spf1 include:_spf.google.com -all",
+    "v=spf1 include:spf.protection.outlook.com ~all",
+    "v=spf1 a mx ?all",
+    None,
+]
+
+# include: targets of SPF_RECORDS, shared by every synthetic domain like real provider chains
+PROVIDER_SPF = {
+    "_spf.google.com": "v=spf1 include:_netblocks.google.com include:_netblocks2.google.com include:_netblocks3.google.com ~all",
+    "_netblocks.google.com": "v=spf1 ip4:35.190.247.0/24 ip4:64.233.160.0/19 ~all",
+    "_netblocks2.google.com": "v=spf1 ip6:2001:4860:4000::/36 ~all",
+    "_netblocks3.google.com": "v=spf1 ip4:172.217.0.0/19 ~all",
+    "spf.protection.outlook.com": "v=spf1 ip4:40.92.0.0/15 ip4:40.107.0.0/16 -all",
+}
+
+DMARC_RECORDS = [
+    "v=DMARC1; p=reject; rua=mailto:dmarc@{domain}",
+    "v=DMARC1; p=quarantine",
+    "v=DMARC1; p=none",
+    None,
+]
+
+SOA_TEXT = "ns1.fakedns.test. hostmaster.fakedns.test. 1 3600 600 86400 300"
+
+
+def synthetic_domains(count, prefix="bench"):
+    """Return `count` distinct domain names spread over TLDS."""
+    return [f"{prefix}{i:07d}.{TLDS[i % len(TLDS)]}" for i in range(count)]
+
+
+def profile(domain):
+    """Deterministic properties of a synthetic domain."""
+    digest = hashlib.md5(domain.lower().encode()).digest()
+    a, b, c, d, e = digest[:5]
+    return {
+        "dead": a % 100 < 10,
+        "mx": None if b % 10 == 0 else MX_HOSTS[b % len(MX_HOSTS)],
+        "spf": SPF_RECORDS[c % len(SPF_RECORDS)],
+        "dmarc": DMARC_RECORDS[d % len(DMARC_RECORDS)],
+        "site": ["live", "live", "live", "live", "live", "live", "redirect", "missing", "missing", "down"][e % 10],
+        "deliverability": ["DELIVERABLE", "DELIVERABLE", "UNDELIVERABLE", "UNKNOWN"][(a + e) % 4],
+        "created": datetime(2015, 1, 1, tzinfo=timezone.utc) + timedelta(days=int.from_bytes(digest[5:7], "big") % 3650),
+        "ip": f"{11 + digest[7] % 200}.{digest[8]}.{digest[9]}.{digest[10]}",
+    }
+
+
+class Behaviour:
+    """Latency, error rate and 429 rate of one fake service."""
+
+    OK = "ok"
+    ERROR = "error"
+    RATE_LIMITED = "rate_limited"
+
+    def __init__(self, latency_ms=0, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {self.OK: 0, self.ERROR: 0, self.RATE_LIMITED: 0}
+
+    @classmethod
+    def parse(cls, spec):
+        """Build a Behaviour from "latency_ms:error_rate:rate_limit_rate" (trailing parts optional)."""
+        parts = [float(part) for part in spec.split(":") if part != ""]
+        return cls(*parts)
+
+    def outcome(self):
+        """Sleep for the configured latency and decide how this request is answered."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                result = self.RATE_LIMITED
+            elif roll < self.rate_limit_rate + self.error_rate:
+                result = self.ERROR
+            else:
+                result = self.OK
+            self.counts[result] += 1
+        return result
+
+
+def iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class FakeDNSServer(socketserver.ThreadingUDPServer):
+    """Authoritative DNS for every synthetic domain.
+
+    Dead domains answer NXDOMAIN and missing records answer NOERROR/NODATA, both
+    with an SOA in the authority section so negative caching works. Errors
+    answer SERVFAIL and rate-limited queries are dropped, like a server doing
+    response rate limiting.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, behaviour, host="127.0.0.1", port=0):
+        self.behaviour = behaviour
+        super().__init__((host, port), FakeDNSHandler)
+
+    def answer(self, request):
+        response = dns.message.make_response(request)
+        question = request.question[0]
+        name = question.name.to_text(omit_final_dot=True).lower()
+        if question.rdtype == dns.rdatatype.TXT and name in PROVIDER_SPF:
+            response.answer.append(dns.rrset.from_text(question.name, 300, "IN", "TXT", f'"{PROVIDER_SPF[name]}"'))
+            return response
+        domain = name[len("_dmarc."):] if name.startswith("_dmarc.") else name
+        info = profile(domain)
+        zone = dns.name.from_text(domain.rsplit(".", 1)[-1] + ".")
+        soa = dns.rrset.from_text(zone, 300, "IN", "SOA", SOA_TEXT)
+
+        if info["dead"]:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(soa)
+            return response
+
+        records = []
+        if question.rdtype == dns.rdatatype.MX and name == domain and info["mx"]:
+            records = [f"10 {info['mx']}.", f"20 alt.{info['mx']}."]
+        elif question.rdtype == dns.rdatatype.TXT and name == domain and info["spf"]:
+            records = [f'"{info["spf"]}"']
+        elif question.rdtype == dns.rdatatype.TXT and name != domain and info["dmarc"]:
+            records = ['"' + info["dmarc"].format(domain=domain) + '"']
+        elif question.rdtype == dns.rdatatype.NS and name == domain:
+            records = ["ns1.fakedns.test.", "ns2.fakedns.test."]
+        elif question.rdtype == dns.rdatatype.SOA and name == domain:
+            records = [SOA_TEXT]
+
+        if records:
+            response.answer.append(dns.rrset.from_text(question.name, 300, "IN", question.rdtype, *records))
+        else:
+            response.authority.append(soa)
+        return response
+
+
+class FakeDNSHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        outcome = self.server.behaviour.outcome()
+        if outcome == Behaviour.RATE_LIMITED:
+            return
+        try:
+            request = dns.message.from_wire(data)
+        except Exception:
+            return
+        if outcome == Behaviour.ERROR:
+            response = dns.message.make_response(request)
+            response.set_rcode(dns.rcode.SERVFAIL)
+        else:
+            response = self.server.answer(request)
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+def whois_text(domain):
+    """WHOIS answer in the Verisign layout understood by the whois library."""
+    info = profile(domain)
+    if info["dead"]:
+        return f'No match for "{domain.upper()}".\r\n'
+    created = info["created"]
+    return (
+        f"   Domain Name: {domain.upper()}\r\n"
+        f"   Registrar WHOIS Server: whois.fakeregistrar.test\r\n"
+        f"   Registrar URL: http://www.fakeregistrar.test\r\n"
+        f"   Updated Date: {iso(created + timedelta(days=300))}\r\n"
+        f"   Creation Date: {iso(created)}\r\n"
+        f"   Registry Expiry Date: {iso(created + timedelta(days=365 * 12))}\r\n"
+        f"   Registrar: Fake Registrar, LLC\r\n"
+        f"   Registrar Abuse Contact Email: abuse@fakeregistrar.test\r\n"
+        f"   Name Server: NS1.FAKEDNS.TEST\r\n"
+        f">>> Last update of whois database: {iso(datetime.now(timezone.utc))} <<<\r\n"
+    )
+
+
+class FakeWhoisServer(socketserver.ThreadingTCPServer):
+    """Port-43 WHOIS: reads one query line and answers with plain text.
+
+    Rate-limited connections are reset without an answer, the way busy
+    registries drop clients; errors close the connection with an empty answer.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, behaviour, host="127.0.0.1", port=0):
+        self.behaviour = behaviour
+        super().__init__((host, port), FakeWhoisHandler)
+
+
+class FakeWhoisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        query = self.rfile.readline().decode("utf-8", "replace").strip()
+        outcome = self.server.behaviour.outcome()
+        if outcome == Behaviour.RATE_LIMITED:
+            # SO_LINGER with a zero timeout makes close() send a RST
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            return
+        if outcome == Behaviour.ERROR:
+            return
+        domain = query.split()[-1].lower() if query else ""
+        self.wfile.write(whois_text(domain).encode())
+
+
+def whois_query(host, port, domain, timeout=10):
+    """Send a WHOIS query to (host, port) and return the raw text answer."""
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(f"{domain}\r\n".encode())
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks).decode("utf-8", "replace")
+
+
+def rdap_document(domain):
+    info = profile(domain)
+    created = info["created"]
+    return {
+        "objectClassName": "domain",
+        "ldhName": domain.upper(),
+        "events": [
+            {"eventAction": "registration", "eventDate": iso(created)},
+            {"eventAction": "last changed", "eventDate": iso(created + timedelta(days=300))},
+            {"eventAction": "expiration", "eventDate": iso(created + timedelta(days=365 * 12))},
+        ],
+        "entities": [{
+            "objectClassName": "entity",
+            "roles": ["registrar"],
+            "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["fn", {}, "text", "Fake Registrar, LLC"]]],
+            "entities": [{
+                "objectClassName": "entity",
+                "roles": ["abuse"],
+                "vcardArray": ["vcard", [["version", {}, "text", "4.0"], ["email", {}, "text", "abuse@fakeregistrar.test"]]],
+            }],
+        }],
+    }
+
+
+def flag(value):
+    return {"value": value, "text": "TRUE" if value else "FALSE"}
+
+
+def email_document(email):
+    domain = email.rsplit("@", 1)[-1]
+    info = profile(domain)
+    return {
+        "email": email,
+        "autocorrect": "",
+        "deliverability": info["deliverability"],
+        "quality_score": "0.70" if info["deliverability"] == "DELIVERABLE" else "0.01",
+        "is_valid_format": flag(True),
+        "is_free_email": flag(False),
+        "is_disposable_email": flag(True),
+        "is_role_email": flag(True),
+        "is_catchall_email": flag(info["mx"] is not None),
+        "is_mx_found": flag(info["mx"] is not None and not info["dead"]),
+        "is_smtp_valid": flag(info["deliverability"] == "DELIVERABLE"),
+    }
+
+
+def ip_document(ip):
+    digest = hashlib.md5(ip.encode()).digest()
+    network = ".".join(ip.split(".")[:3]) + ".0/24"
+    return {
+        "ip_address": ip,
+        "security": {key: bool(digest[i] % 7 == 0) for i, key in enumerate(
+            ["is_vpn", "is_proxy", "is_tor", "is_hosting", "is_relay", "is_mobile", "is_abuse"])},
+        "asn": {"asn": 64512 + digest[8], "name": f"Fake Network {digest[8]}", "domain": "fakenet.test",
+                "type": "hosting", "route": network},
+        "company": {"name": f"Fake Company {digest[9]}", "domain": "fakecompany.test", "type": "business"},
+        "location": {"city": "Springfield", "region": "Nowhere", "country": "United States",
+                     "country_code": "US", "continent": "North America",
+                     "longitude": -90.0 + digest[10] / 10, "latitude": 40.0 + digest[11] / 10},
+        "timezone": {"name": "America/Chicago"},
+        "currency": {"currency_name": "USD"},
+    }
+
+
+def fakefilter_document(domains, now=None):
+    """fakefilter data_version2.json payload where every domain was first seen in the last day."""
+    now = int(now or time.time())
+    return {
+        "version": 2,
+        "domains": {
+            domain: {"hosts": {domain: {"firstseen": now - 3600 - i % 80000, "lastseen": now}}}
+            for i, domain in enumerate(domains)
+        },
+    }
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    """One HTTP server for every web endpoint, routed by the first path segment.
+
+    Routes and their Behaviour names: /email/ ("email"), /ip/ ("ip"),
+    /fakefilter.json ("fakefilter"), /rdap/domain/<d> ("rdap"),
+    /slack/api/<method> and /slack/upload/<id> ("slack"),
+    /site/<scheme>/<domain> ("site").
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+    def __init__(self, behaviours, host="127.0.0.1", port=0):
+        self.behaviours = behaviours
+        self.feed = b'{"version": 2, "domains": {}}'
+        self.feed_etag = '"empty"'
+        self.uploads = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        super().__init__((host, port), FakeHTTPHandler)
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def set_feed(self, domains):
+        """Serve a fakefilter feed containing `domains`."""
+        self.feed = json.dumps(fakefilter_document(domains)).encode()
+        self.feed_etag = '"' + hashlib.md5(self.feed).hexdigest() + '"'
+
+
+class FakeHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so pooled sessions reuse connections
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type="application/json", headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        name = {"fakefilter.json": "fakefilter"}.get(parts[0] if parts else "", parts[0] if parts else "")
+        behaviour = self.server.behaviours.get(name)
+        if behaviour is None:
+            return self.send_body(404, {"error": "unknown route"})
+
+        outcome = behaviour.outcome()
+        if outcome == Behaviour.RATE_LIMITED:
+            return self.send_body(429, {"error": "rate limited"}, headers={"Retry-After": "1"})
+        if outcome == Behaviour.ERROR:
+            if name == "site":
+                self.close_connection = True  # Looks like a refused/reset connection to the prober
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                return
+            return self.send_body(500, {"ok": False, "error": "fatal_error"})
+
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        getattr(self, f"serve_{name}")(parts[1:], query)
+
+    do_GET = route
+    do_POST = route
+    do_HEAD = route
+
+    def serve_email(self, parts, query):
+        self.send_body(200, email_document(query.get("email", "")))
+
+    def serve_ip(self, parts, query):
+        self.send_body(200, ip_document(query.get("ip_address", "")))
+
+    def serve_fakefilter(self, parts, query):
+        server = self.server
+        if self.headers.get("If-None-Match") == server.feed_etag:
+            return self.send_body(304, b"", headers={"ETag": server.feed_etag})
+        self.send_body(200, server.feed, headers={"ETag": server.feed_etag})
+
+    def serve_rdap(self, parts, query):
+        domain = parts[-1].lower() if parts else ""
+        if profile(domain)["dead"]:
+            return self.send_body(404, {"errorCode": 404, "title": "Not Found"}, "application/rdap+json")
+        self.send_body(200, rdap_document(domain), "application/rdap+json")
+
+    def serve_slack(self, parts, query):
+        self.read_body()
+        server = self.server
+        kind, rest = (parts[0], parts[1:]) if parts else ("", [])
+        if kind == "upload":
+            with server.lock:
+                server.uploads += 1
+            return self.send_body(200, b"OK - uploaded", "text/plain")
+        method = rest[0] if rest else ""
+        if method == "files.getUploadURLExternal":
+            return self.send_body(200, {"ok": True, "file_id": "FBENCH", "upload_url": f"{server.base_url}/slack/upload/FBENCH"})
+        if method == "files.info":
+            return self.send_body(200, {"ok": True, "file": {"id": "FBENCH", "permalink": "https://slack.test/files/FBENCH"}})
+        if method == "chat.postMessage":
+            with server.lock:
+                server.messages.append(method)
+        self.send_body(200, {"ok": True})
+
+    def serve_site(self, parts, query):
+        domain = parts[-1].lower() if parts else ""
+        site = profile(domain)["site"]
+        if site == "down":
+            self.close_connection = True
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            return
+        if site == "redirect":
+            return self.send_body(301, b"", "text/html", headers={"Location": f"https://www.{domain}/"})
+        if site == "missing":
+            return self.send_body(404, b"<html><body>Not found</body></html>", "text/html")
+        self.send_body(200, b"<html><head><title>Fake site</title></head><body>ok</body></html>", "text/html")
+
+
+class FakeServices:
+    """Starts the DNS, WHOIS and HTTP fakes on free local ports, each in its own thread."""
+
+    NAMES = ["dns", "whois", "email", "ip", "fakefilter", "rdap", "slack", "site"]
+
+    def __init__(self, behaviours=None):
+        behaviours = dict(behaviours or {})
+        self.behaviours = {name: behaviours.get(name) or Behaviour() for name in self.NAMES}
+        self.dns = FakeDNSServer(self.behaviours["dns"])
+        self.whois = FakeWhoisServer(self.behaviours["whois"])
+        self.http = FakeHTTPServer({name: self.behaviours[name] for name in self.NAMES[2:]})
+        # One RDAP server per TLD, so domains are scheduled per registry like in production
+        self.rdap = {tld: FakeHTTPServer({"rdap": self.behaviours["rdap"]}) for tld in TLDS}
+        self.threads = []
+
+    @property
+    def servers(self):
+        return [self.dns, self.whois, self.http, *self.rdap.values()]
+
+    def start(self):
+        for server in self.servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def rdap_servers(self):
+        """TLD -> RDAP base URL map in the shape RDAPClient.server_map() returns."""
+        return {tld: f"{server.base_url}/rdap/" for tld, server in self.rdap.items()}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def dns_address(self):
+        return self.dns.server_address
+
+    @property
+    def whois_address(self):
+        return self.whois.server_address
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Offline throughput benchmarks for the enrichment stages.
+
+Starts the local fakes from fakes.py, points the pipeline modules at them and
+runs enrich_whois_df (port-43 WHOIS and RDAP), enrich_dns, validate_email,
+enrich_domain_risk, streaming.py and the full main.py flow on synthetic domains. For every
+stage it reports rows/sec and the p50/p99 latency of the calls made inside it.
+
+Usage: python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000]
+           [--stages whois,rdap,dns,email,risk,stream,main] [--latency MS]
+           [--fake NAME=LATENCY_MS:ERROR_RATE:RATE_LIMIT_RATE ...] [--json PATH]
+
+Fake names: dns, whois, email, ip, fakefilter, rdap, slack, site. Caches are
+disabled unless --with-caches is given, and everything a run writes
+(checkpoints, state files, the CSV for Slack) goes to a temporary directory.
+"""
+import argparse
+import functools
+import json
+import os
+import runpy
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.join(os.path.dirname(HERE), "domain_enrichment")
+
+STAGES = ["whois", "rdap", "dns", "email", "risk", "stream", "main"]
+
+
+class LatencyRecorder:
+    """Collects per-call durations under a label."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def reset(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, label, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.samples[label].append(time.perf_counter() - start)
+        return timed
+
+    def wrap_async(self, label, func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self.samples[label].append(time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        import numpy as np
+
+        return {
+            label: {
+                "calls": len(values),
+                "p50_ms": float(np.percentile(values, 50)) * 1000,
+                "p99_ms": float(np.percentile(values, 99)) * 1000,
+            }
+            for label, values in sorted(self.samples.items()) if values
+        }
+
+
+def configure_environment(args):
+    """Settings read by the pipeline modules at import time."""
+    if not args.with_caches:
+        for name in ("DNS_CACHE_PATH", "WHOIS_CACHE_PATH", "API_CACHE_PATH", "SEEN_INDEX_PATH"):
+            os.environ[name] = "off"
+    os.environ["ABSTRACT_API_KEY"] = "benchmark"
+    os.environ["SLACK_USER_OAUTH_TOKEN"] = "xoxb-benchmark"
+    os.environ.setdefault("ABSTRACT_API_RPS", str(args.api_rps))
+    os.environ.setdefault("ABSTRACT_API_WORKERS", str(args.api_workers))
+    os.environ.setdefault("WHOIS_RATE_PER_SERVER", str(args.whois_rate))
+
+
+def point_at_fakes(services, recorder):
+    """Redirect every network client of the pipeline to the local fakes and time their calls."""
+    import whois
+    from slack_sdk import WebClient
+    import dns_checker
+    import domain_fetcher
+    import domain_risk_enricher
+    import email_validator
+    import send_output_to_slack
+    import streaming
+    import whois_checker
+    from fakes import whois_query
+
+    dns_host, dns_port = services.dns_address
+    for resolver in (dns_checker.resolver, dns_checker.async_resolver):
+        resolver.port = dns_port  # Set before nameservers, which pick up the port on assignment
+        resolver.nameservers = [dns_host]
+
+    whois_host, whois_port = services.whois_address
+
+    def fake_whois(domain, *args, **kwargs):
+        return whois.parser.WhoisEntry.load(domain, whois_query(whois_host, whois_port, domain))
+
+    whois.whois = fake_whois
+    whois_checker.rdap_client.servers = services.rdap_servers()
+    whois_checker.fetch_whois_data = recorder.wrap("whois lookup", whois_checker.fetch_whois_data)
+
+    dns_checker.lookup_domain_async = recorder.wrap_async("dns lookup", dns_checker.lookup_domain_async)
+    for name in ("get_mx_records", "get_spf_strict", "get_dmarc_policy"):
+        setattr(dns_checker, name, recorder.wrap("dns lookup", getattr(dns_checker, name)))
+
+    site_url = f"{services.http.base_url}/site"
+    prober = dns_checker.live_site_prober
+    attempt = prober.attempt
+
+    def fake_attempt(url):
+        scheme, _, host = url.partition("://")
+        return attempt(f"{site_url}/{scheme}/{host}")
+
+    prober.attempt = recorder.wrap("site probe", fake_attempt)
+
+    email_validator.api_client.base_url = f"{services.http.base_url}/email/"
+    email_validator.api_client.get = recorder.wrap("email api", email_validator.api_client.get)
+
+    domain_risk_enricher.detect_provider = recorder.wrap("provider match", domain_risk_enricher.detect_provider)
+
+    # streaming.py imports these by name, so its copies are swapped for the timed ones too
+    streaming.fetch_whois_data = whois_checker.fetch_whois_data
+    for name in ("get_mx_records", "get_spf_strict", "get_dmarc_policy"):
+        setattr(streaming, name, getattr(dns_checker, name))
+    streaming.detect_provider = domain_risk_enricher.detect_provider
+
+    domain_fetcher.FAKEFILTER_URL = f"{services.http.base_url}/fakefilter.json"
+    send_output_to_slack.WebClient = functools.partial(WebClient, base_url=f"{services.http.base_url}/slack/api/")
+
+
+def risk_input(df):
+    """Columns enrich_domain_risk reads, filled the way the DNS and email fakes answer them."""
+    from fakes import profile
+
+    profiles = [profile(domain) for domain in df["domain"]]
+    df = df.copy()
+    df["mx_records"] = [
+        "Unknown" if p["dead"] or not p["mx"] else f"{p['mx']}., alt.{p['mx']}." for p in profiles
+    ]
+    df["deliverability"] = [p["deliverability"] for p in profiles]
+    return df
+
+
+def run_stage(name, size, services, workdir):
+    """Run one stage on `size` synthetic domains and return the number of rows it produced."""
+    import pandas as pd
+    from fakes import synthetic_domains
+
+    domains = synthetic_domains(size)
+    df = pd.DataFrame({"domain": domains, "firstseen": int(time.time())})
+
+    if name in ("whois", "rdap"):
+        from whois_checker import enrich_whois_df
+        return len(enrich_whois_df(df, backend="rdap" if name == "rdap" else "whois"))
+    if name == "dns":
+        from dns_checker import enrich_dns
+        return len(enrich_dns(df, use_async=True))
+    if name == "email":
+        from email_validator import validate_email
+        return len(validate_email(df))
+    if name == "risk":
+        from domain_risk_enricher import enrich_domain_risk
+        return len(enrich_domain_risk(risk_input(df)))
+    if name == "stream":
+        from streaming import DomainRecord, stream_domains
+        records = (DomainRecord(domain, firstseen) for domain, firstseen in zip(df["domain"], df["firstseen"]))
+        return stream_domains(records, os.path.join(workdir, f"stream-{size}.csv"))
+    if name == "main":
+        services.http.set_feed(domains)
+        rundir = os.path.join(workdir, f"main-{size}")
+        os.makedirs(rundir, exist_ok=True)
+        cwd = os.getcwd()
+        os.chdir(rundir)
+        try:
+            result = runpy.run_path(os.path.join(PACKAGE_DIR, "main.py"), run_name="__main__")
+        finally:
+            os.chdir(cwd)
+        return len(result.get("df", []))
+    raise ValueError(f"Unknown stage {name}")
+
+
+def time_pipeline_stages(recorder):
+    """Record the wall time of each Pipeline stage when main.py runs."""
+    from pipeline import Pipeline
+
+    run = Pipeline.run_stage
+
+    def timed(self, stage, df):
+        return recorder.wrap(f"main stage {stage.name}", run)(self, stage, df)
+
+    Pipeline.run_stage = timed
+
+
+def print_result(result):
+    print(f"📢 {result['stage']:>6} x {result['size']:>7}: {result['rows']} rows in "
+          f"{result['seconds']:.2f}s ({result['rows_per_second']:.1f} rows/sec)")
+    for label, stats in result["latency"].items():
+        print(f"      {label:<22} {stats['calls']:>8} calls  p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--latency", type=float, default=5.0, help="Default latency of every fake, in ms")
+    parser.add_argument("--fake", action="append", default=[], metavar="NAME=MS:ERRORS:RATE_LIMITS",
+                        help="Override one fake, e.g. dns=20:0.01:0.001")
+    parser.add_argument("--api-rps", type=float, default=1000)
+    parser.add_argument("--api-workers", type=int, default=32)
+    parser.add_argument("--whois-rate", type=float, default=1000, help="Queries per second per WHOIS server")
+    parser.add_argument("--with-caches", action="store_true", help="Keep the SQLite caches enabled")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    configure_environment(args)
+    workdir = tempfile.mkdtemp(prefix="domain-enrichment-bench-")
+    os.chdir(workdir)
+    sys.path[:0] = [PACKAGE_DIR, HERE]
+
+    from fakes import Behaviour, FakeServices
+
+    behaviours = {name: Behaviour(args.latency) for name in FakeServices.NAMES}
+    for spec in args.fake:
+        name, _, values = spec.partition("=")
+        if name not in behaviours:
+            parser.error(f"unknown fake {name!r}, expected one of {FakeServices.NAMES}")
+        behaviours[name] = Behaviour.parse(values)
+
+    recorder = LatencyRecorder()
+    results = []
+    with FakeServices(behaviours) as services:
+        point_at_fakes(services, recorder)
+        if "main" in stages:
+            time_pipeline_stages(recorder)
+        print(f"🏁 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Benchmarks in {workdir}")
+
+        for size in sizes:
+            for stage in stages:
+                recorder.reset()
+                start = time.perf_counter()
+                rows = run_stage(stage, size, services, workdir)
+                seconds = time.perf_counter() - start
+                result = {
+                    "stage": stage,
+                    "size": size,
+                    "rows": rows,
+                    "seconds": seconds,
+                    "rows_per_second": rows / seconds if seconds else 0.0,
+                    "latency": recorder.summary(),
+                }
+                results.append(result)
+                print_result(result)
+
+        fake_counts = {name: dict(behaviour.counts) for name, behaviour in services.behaviours.items()}
+
+    print("✅ Benchmarks")
+    for result in results:
+        print_result(result)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"results": results, "fakes": fake_counts, "args": vars(args)}, f, indent=2)
+        print(f"📢 Results written to {json_path}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Command line entry point for the enrichment jobs.
+
+    python cli.py run [--input domains.csv] [--output enriched.csv [--stages dns,email,risk]]
+    python cli.py whois --input domains.csv [--output domains-ready.csv]
+    python cli.py dns --input domains.csv [--output domains-ready.csv]
+    python cli.py validate-emails [--input company_emails.csv] [--output company_emails_ready.csv]
+    python cli.py ip-intel [--input ips_to_enrich.csv] [--output ips_to_enrich-ready.csv]
+    python cli.py org-names [--input df_test2.csv] [--output df_test2-ready.csv]
+
+Only argparse is imported up front. pandas, dnspython, whois, slack_sdk and
+the API clients are imported by the subcommand that needs them, after .env
+is loaded, so a DNS-only recheck does not pay for the WHOIS or Slack setup.
+"""
+import argparse
+import os
+import sys
+
+# Ahead of site-packages so domain_enrichment/email_validator.py wins over the email-validator package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_enrichment"))
+
+
+def default_output(input_path):
+    """<name>-ready.csv next to the input, as the standalone scripts name their output."""
+    root, _ = os.path.splitext(input_path)
+    return f"{root}-ready.csv"
+
+
+def parse_stages(value):
+    """Split --stages and reject unknown stages or missing dependencies before anything runs."""
+    from enrichment import check_stages
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    try:
+        check_stages(stages)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return stages
+
+
+def run_pipeline(args):
+    from main import run
+    run(args.input, args.output, args.stages)
+
+
+def run_stage(stage):
+    def command(args):
+        import pandas as pd
+        from enrichment import build_pipeline
+        df = build_pipeline(stages=[stage]).run(pd.read_csv(args.input))
+        output_path = args.output or default_output(args.input)
+        df.to_csv(output_path, index=False)
+        print(f"✅ Results saved to {output_path}")
+    return command
+
+
+def validate_emails(args):
+    from validate_emails import validate_emails
+    validate_emails(args.input or "company_emails.csv", args.output or "company_emails_ready.csv")
+
+
+def ip_intel(args):
+    from ip_intelligence import enrich_ips
+    enrich_ips(args.input or "ips_to_enrich.csv", args.output or "ips_to_enrich-ready.csv")
+
+
+def org_names(args):
+    from get_organization_name import enrich_org_names
+    enrich_org_names(args.input or "df_test2.csv", args.output or "df_test2-ready.csv")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Enrich disposable email domains, emails and IPs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="fetch new domains, enrich them and send them to Slack")
+    run.add_argument("--input", help="CSV with a domain column to enrich instead of fetching new domains")
+    run.add_argument("--output", help="write the result to this CSV instead of sending it to Slack (required with --stages)")
+    run.add_argument("--stages", type=parse_stages, help="comma separated stages: preflight,whois,dns,email,risk (risk needs dns and email)")
+    run.set_defaults(func=run_pipeline)
+
+    for name in ("whois", "dns"):
+        stage = commands.add_parser(name, help=f"add the {name} columns to a CSV with a domain column")
+        stage.add_argument("--input", required=True)
+        stage.add_argument("--output", help="default: <input>-ready.csv")
+        stage.set_defaults(func=run_stage(name))
+
+    for name, func, help_text in (
+        ("validate-emails", validate_emails, "validate the $email column of a CSV"),
+        ("ip-intel", ip_intel, "add IP intelligence columns to a CSV with an ip_address column"),
+        ("org-names", org_names, "scrape the site name of every domain in a CSV"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--input")
+        command.add_argument("--output")
+        command.set_defaults(func=func)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "run" and args.stages is not None and not args.output:
+        from enrichment import STAGES
+        if set(args.stages) != set(STAGES):
+            parser.error("--stages without every stage needs --output; only full results go to Slack and the seen-domain index")
+    from dotenv import load_dotenv
+    load_dotenv()  # Before any stage module reads its settings
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+from rate_limiter import TokenBucket
+
+EMAIL_VALIDATION_URL = "https://emailvalidation.abstractapi.com/v1/"
+IP_INTELLIGENCE_URL = "https://ip-intelligence.abstractapi.com/v1/"
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header as seconds (it may be a number or an HTTP date)."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return int(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AbstractAPIClient:
+    """Rate-limited AbstractAPI client shared by the email and IP enrichment scripts.
+
+    Requests go through one pooled session and a token bucket sized from the
+    plan's requests per second. Several requests are kept in flight, and 429/5xx
+    answers are retried with jittered exponential backoff that honours Retry-After.
+    """
+
+    def __init__(self, base_url, api_key, requests_per_second=2, max_workers=4, quota=None,
+                 max_retries=4, timeout=(5, 30), name="AbstractAPI"):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.quota = quota
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.name = name
+        self.bucket = TokenBucket(requests_per_second, capacity=max(1, int(requests_per_second)))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.calls = 0
+        self.retries = 0
+        self.lock = Lock()
+
+    def get(self, **params):
+        """Call the API and return the parsed JSON, or None if the call failed."""
+        for attempt in range(self.max_retries + 1):
+            metrics.slept(self.bucket.acquire(), "api", self.name, "rate_limit")
+            with self.lock:
+                self.calls += 1
+            retry_after = None
+            with metrics.call("api", self.name) as call:
+                try:
+                    response = self.session.get(
+                        self.base_url, params={"api_key": self.api_key, **params}, timeout=self.timeout
+                    )
+                    call.outcome = f"http_{response.status_code}"
+                except requests.exceptions.RequestException:
+                    call.outcome = "error"
+                    response = None
+            if response is not None:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        return None
+                if response.status_code != 429 and response.status_code < 500:
+                    return None
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            if attempt == self.max_retries:
+                break
+            with self.lock:
+                self.retries += 1
+            metrics.retry("api", self.name)
+            delay = retry_after if retry_after is not None else random.uniform(0, min(30, 2 ** attempt))
+            reason = "retry"
+            if response is not None and response.status_code == 429:
+                self.bucket.pause(delay)  # The quota is shared, so hold back every worker
+                reason = "rate_limit"
+            metrics.sleep(delay, "api", self.name, reason)
+        return None
+
+    def fetch_many(self, param, values, tracker=None):
+        """Call the API once per value (passed as `param`) concurrently, returning results in order."""
+        values = list(values)
+        results = [None] * len(values)
+        if tracker is None:
+            tracker = metrics.tracker(self.name, total=len(values))
+
+        def fetch(position, value):
+            results[position] = self.get(**{param: value})
+            tracker.advance()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(fetch, i, value) for i, value in enumerate(values)]:
+                future.result()
+        return results
+
+    def usage(self):
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "quota": self.quota,
+            "remaining": self.quota - self.calls if self.quota else None,
+        }
+
+    def report(self):
+        usage = self.usage()
+        quota = f" of {usage['quota']} quota ({usage['remaining']} left)" if usage["quota"] else ""
+        print(f"📢 {self.name}: {usage['calls']} calls made{quota}, {usage['retries']} retries")
+
+
+def client_from_env(base_url, api_key, name="AbstractAPI"):
+    """Build a client using the plan limits in ABSTRACT_API_RPS, ABSTRACT_API_WORKERS and ABSTRACT_API_QUOTA."""
+    quota = os.getenv("ABSTRACT_API_QUOTA")
+    return AbstractAPIClient(
+        base_url,
+        api_key,
+        requests_per_second=float(os.getenv("ABSTRACT_API_RPS", "2")),
+        max_workers=int(os.getenv("ABSTRACT_API_WORKERS", "4")),
+        quota=int(quota) if quota else None,
+        name=name,
+    )
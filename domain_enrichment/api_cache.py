@@ -0,0 +1,116 @@
+import ipaddress
+import json
+import os
+import time
+
+from metrics import metrics
+from sqlite_cache import SQLiteCache, cache_path
+
+DAY = 86400
+
+
+def normalize_email(email):
+    return str(email).strip().lower()
+
+
+def normalize_ip(ip):
+    try:
+        return str(ipaddress.ip_address(str(ip).strip()))
+    except ValueError:
+        return str(ip).strip()
+
+
+class APIResponseCache(SQLiteCache):
+    """On-disk store of successful API responses keyed by (endpoint, normalized key)."""
+
+    def __init__(self, path="api_cache.sqlite3", ttl_days=30):
+        super().__init__(path, """CREATE TABLE IF NOT EXISTS responses (
+            endpoint TEXT NOT NULL,
+            key TEXT NOT NULL,
+            response TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (endpoint, key)
+        )""")
+        self.ttl_days = ttl_days
+
+    def get_many(self, endpoint, keys, chunk_size=500):
+        """Return {key: response} for keys with a response younger than ttl_days."""
+        keys = list(keys)
+        oldest = time.time() - self.ttl_days * DAY
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), chunk_size):
+                chunk = keys[start:start + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, response FROM responses WHERE endpoint = ? AND fetched_at > ? AND key IN ({placeholders})",
+                    [endpoint, oldest, *chunk],
+                ).fetchall()
+                found.update((key, json.loads(response)) for key, response in rows)
+        metrics.cache(f"api:{endpoint}", len(found), len(keys) - len(found))
+        return found
+
+    def items(self, endpoint):
+        """Yield (key, response, fetched_at) for every fresh response of an endpoint."""
+        oldest = time.time() - self.ttl_days * DAY
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, response, fetched_at FROM responses WHERE endpoint = ? AND fetched_at > ?",
+                (endpoint, oldest),
+            ).fetchall()
+        for key, response, fetched_at in rows:
+            yield key, json.loads(response), fetched_at
+
+    def put_many(self, endpoint, responses):
+        """Store {key: response}, skipping failed (None) responses."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses (endpoint, key, response, fetched_at) VALUES (?, ?, ?, ?)",
+                [(endpoint, key, json.dumps(response), now) for key, response in responses.items() if response],
+            )
+            self._conn.commit()
+
+
+def open_default_cache():
+    """Open the cache configured by API_CACHE_PATH/API_CACHE_TTL_DAYS, or None if disabled."""
+    path = cache_path("API_CACHE_PATH", "api_cache.sqlite3")
+    return APIResponseCache(path, ttl_days=float(os.getenv("API_CACHE_TTL_DAYS", "30"))) if path else None
+
+
+def fetch_unique(client, param, keys, cache=None, progress=None):
+    """Return {key: response} for the distinct keys, calling the API only for cache misses.
+
+    With a StageProgress, successful responses are saved every `progress.every`
+    keys and keys answered before an interruption are not fetched again.
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    results = cache.get_many(client.base_url, unique_keys) if cache is not None else {}
+    if progress is not None:
+        results.update(progress.completed())
+    missing = [key for key in unique_keys if key not in results]
+    print(f"📢 {len(keys)} rows, {len(unique_keys)} unique keys, {len(results)} cached, {len(missing)} to fetch")
+
+    step = progress.every if progress is not None else max(len(missing), 1)
+    tracker = metrics.tracker(client.name, total=len(missing))
+    for start in range(0, len(missing), step):
+        chunk = missing[start:start + step]
+        fetched = dict(zip(chunk, client.fetch_many(param, chunk, tracker)))
+        if cache is not None:
+            cache.put_many(client.base_url, fetched)
+        if progress is not None:
+            for key, response in fetched.items():
+                if response:
+                    progress.add(key, response)
+        results.update(fetched)
+    if progress is not None:
+        progress.flush()
+    return results
+
+
+def fan_out(df, keys, results):
+    """Merge per-key results (a ResultAccumulator filled with add()) back onto every row with that key."""
+    lookup = results.to_frame(key_column="_lookup_key")
+    df = df.drop(columns=[column for column in results.columns if column in df.columns])
+    df = df.assign(_lookup_key=list(keys)).merge(lookup, on="_lookup_key", how="left")
+    return df.drop(columns="_lookup_key")
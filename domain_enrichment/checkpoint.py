@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from atomic_file import atomic_write
+from metrics import metrics
+
+
+def input_hash(df):
+    """Return a short, order-independent hash of the domains in a frame."""
+    digest = hashlib.sha256("\n".join(sorted(map(str, df["domain"]))).encode())
+    return digest.hexdigest()[:12]
+
+
+class StageProgress:
+    """Per-domain results of a long stage, appended to a JSON lines file every `every` domains."""
+
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+        self.buffer = []
+        self.lock = threading.Lock()
+
+    def completed(self):
+        """Return {key: record} for everything saved by a previous, interrupted run."""
+        done = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        key, record = json.loads(line)
+                    except ValueError:
+                        break  # Partially written last line
+                    done[key] = record
+        return done
+
+    def add(self, key, record):
+        with self.lock:
+            self.buffer.append((key, record))
+            if len(self.buffer) >= self.every:
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            self._write()
+
+    def _write(self):
+        if not self.buffer:
+            return
+        with open(self.path, "a") as f:
+            for key, record in self.buffer:
+                f.write(json.dumps([key, record], default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.buffer = []
+
+    def clear(self):
+        with self.lock:
+            self.buffer = []
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class RunCheckpoint:
+    """Stage outputs of one pipeline run, saved as Parquet under checkpoints/<run date>/.
+
+    Stages after the fetch are stored in a subdirectory named after the hash of
+    the fetched domains, so a rerun only reuses them for the same input.
+    """
+
+    def __init__(self, run_date=None, root="checkpoints", every=100):
+        self.run_date = run_date or datetime.now().strftime("%Y-%m-%d")
+        self.every = every
+        self.directory = os.path.join(root, self.run_date)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def set_input(self, df):
+        """Key the following stages on the domains they will process."""
+        self.directory = os.path.join(self.directory, input_hash(df))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, name, suffix):
+        return os.path.join(self.directory, f"{name}{suffix}")
+
+    def progress(self, name):
+        return StageProgress(self.path(name, ".partial.jsonl"), every=self.every)
+
+    def run_stage(self, name, func, *args, partial=False, **kwargs):
+        """Run a stage unless it already finished, saving its output when it completes.
+
+        DataFrame results are saved as Parquet. Any other truthy result marks
+        the stage as done. With partial=True the stage receives a StageProgress
+        as `progress` and resumes from the last saved domain.
+        """
+        parquet_path = self.path(name, ".parquet")
+        done_path = self.path(name, ".done")
+        if os.path.exists(parquet_path):
+            print(f"⏭️ Skipping {name}, loaded checkpoint {parquet_path}")
+            return pd.read_parquet(parquet_path)
+        if os.path.exists(done_path):
+            print(f"⏭️ Skipping {name}, already completed")
+            return True
+
+        progress = self.progress(name) if partial else None
+        if progress is not None:
+            kwargs["progress"] = progress
+        with metrics.timer("stage_seconds", stage=name):
+            result = func(*args, **kwargs)
+
+        if isinstance(result, pd.DataFrame):
+            with atomic_write(parquet_path, "wb") as f:
+                result.to_parquet(f, index=False)
+        elif result:
+            with open(done_path, "w") as f:
+                f.write(datetime.now().isoformat())
+        if progress is not None:
+            progress.clear()
+        return result
@@ -0,0 +1,76 @@
+import os
+import time
+
+from metrics import metrics
+from sqlite_cache import SQLiteCache, cache_path
+
+
+class DNSAnswerCache(SQLiteCache):
+    """On-disk cache of DNS answers keyed by (name, record type).
+
+    Positive answers are stored as the text form of each record and expire with
+    the record TTL. Negative answers (NXDOMAIN/NoAnswer) are stored as an empty
+    record list and expire with the SOA minimum from the authority section.
+    """
+
+    def __init__(self, path="dns_cache.sqlite3", min_ttl=0, max_ttl=7 * 86400, commit_every=200):
+        super().__init__(path, """CREATE TABLE IF NOT EXISTS answers (
+            name TEXT NOT NULL,
+            rdtype TEXT NOT NULL,
+            status TEXT NOT NULL,
+            records TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (name, rdtype)
+        )""")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.commit_every = commit_every
+        self._pending = 0
+
+    def lookup(self, name, rdtype):
+        """Return (status, record texts) for a cached answer, or None on a miss."""
+        name = name.lower().rstrip(".")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, records, expires_at FROM answers WHERE name = ? AND rdtype = ?",
+                (name, rdtype),
+            ).fetchone()
+        if row is None or row[2] < time.time():
+            metrics.cache("dns", 0, 1)
+            return None
+        metrics.cache("dns", 1, 0)
+        return row[0], row[1].split("\n") if row[1] else []
+
+    def get(self, name, rdtype):
+        """Return the cached record texts ([] for a negative answer) or None on a miss."""
+        cached = self.lookup(name, rdtype)
+        return cached[1] if cached is not None else None
+
+    def put(self, name, rdtype, records, ttl, status="NOERROR"):
+        """Store an answer for `ttl` seconds, clamped to [min_ttl, max_ttl]."""
+        name = name.lower().rstrip(".")
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (name, rdtype, status, records, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (name, rdtype, status, "\n".join(records), time.time() + ttl),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+
+    def flush(self):
+        """Commit pending writes and drop expired answers."""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            self._pending = 0
+
+def open_default_cache():
+    """Open the cache configured by DNS_CACHE_PATH/DNS_CACHE_MIN_TTL, or None if disabled."""
+    path = cache_path("DNS_CACHE_PATH", "dns_cache.sqlite3")
+    return DNSAnswerCache(path, min_ttl=int(os.getenv("DNS_CACHE_MIN_TTL", "0"))) if path else None
@@ -1,44 +1,141 @@
 import pandas as pd
+import asyncio
 import dns.resolver
-import requests
+import dns.asyncresolver
+import dns.rdatatype
 import time
-from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dns_cache import open_default_cache
+from live_site_prober import LiveSiteProber
+from metrics import metrics
+from domain_status import NXDOMAIN, RESOLVES, UNKNOWN, STATUS_COLUMN, dead_domains, skipped
+from result_accumulator import ResultAccumulator
+from spf_evaluator import MAX_LOOKUPS, SPFEvaluator
 
 # Create a resolver and set it to Google's public DNS
 resolver = dns.resolver.Resolver()
 resolver.nameservers = ['8.8.8.8', '8.8.4.4']  # Google Public DNS
 
+# Asyncio resolver used by the concurrent mode of enrich_dns
+async_resolver = dns.asyncresolver.Resolver()
+async_resolver.nameservers = resolver.nameservers
+
+# Persistent answer cache shared by the blocking and asyncio lookups
+dns_cache = open_default_cache()
+
+# Pooled HTTP prober used for the is_live_site column
+live_site_prober = LiveSiteProber()
+
+DNS_COLUMNS = ['mx_records', 'is_spf_strict', 'is_dmarc_enforced', 'is_live_site']
+
+# Values written for a domain the preflight found to be NXDOMAIN
+DEAD_DNS_RECORD = {
+    'mx_records': "Unknown",
+    'is_spf_strict': "No strict enforcement",
+    'is_dmarc_enforced': "No enforcement",
+    'is_live_site': "Not Live",
+}
+
+# TTL used for negative answers that carry no SOA record
+DEFAULT_NEGATIVE_TTL = 300
+
+def mx_from_answers(answers):
+    """Format MX record texts as a comma separated list of exchanges."""
+    if not answers:
+        return "Unknown"
+    mx_records = [record.split()[-1] for record in answers]
+    return ", ".join(mx_records)
+
+def spf_from_answers(answers, resolve=True):
+    """Check TXT record texts for an SPF policy that is strictly enforced (-all or ~all).
+
+    include: and redirect= are followed through the shared evaluator; a policy
+    over the 10 DNS lookup limit or with a broken include is not enforced.
+    resolve=False only uses targets already in the evaluator's memo.
+    """
+    policy = spf_evaluator.evaluate(answers or [], resolve=resolve)
+    if policy.error is None and policy.qualifier in ("-", "~"):
+        return "Strict"
+    return "No strict enforcement"
+
+def dmarc_from_answers(answers):
+    """Check _dmarc TXT record texts for an enforced policy (p=reject or p=quarantine)."""
+    for txt_record in answers or []:
+        if "v=DMARC1" in txt_record:
+            if "p=reject" in txt_record:
+                return "Enforced"
+            elif "p=quarantine" in txt_record:
+                return "Enforced"
+            elif "p=none" in txt_record:
+                return "No enforcement"
+    return "No enforcement"
+
+def negative_ttl(error):
+    """Return the SOA minimum from the response behind an NXDOMAIN/NoAnswer error."""
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        responses = list((error.kwargs.get("responses") or {}).values())
+    else:
+        responses = [error.kwargs.get("response")]
+    for response in responses:
+        for rrset in getattr(response, "authority", None) or []:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+    return DEFAULT_NEGATIVE_TTL
+
+def negative_outcome(error):
+    return "nxdomain" if isinstance(error, dns.resolver.NXDOMAIN) else "noanswer"
+
+def cache_answer(name, rdtype, answer):
+    """Store a positive answer in the cache and return its record texts."""
+    records = [rdata.to_text() for rdata in answer]
+    if dns_cache is not None:
+        dns_cache.put(name, rdtype, records, answer.expiration - time.time())
+    return records
+
+def cache_negative(name, rdtype, error):
+    """Store an NXDOMAIN/NoAnswer result in the cache and return an empty record list."""
+    if dns_cache is not None:
+        status = "NXDOMAIN" if isinstance(error, dns.resolver.NXDOMAIN) else "NOANSWER"
+        dns_cache.put(name, rdtype, [], negative_ttl(error), status=status)
+    return []
+
+def resolve_records(name, rdtype):
+    """Resolve a name through the cache, returning the record texts ([] when there are none).
+
+    Transient failures such as timeouts are raised and never cached.
+    """
+    cached = dns_cache.get(name, rdtype) if dns_cache is not None else None
+    if cached is not None:
+        return cached
+    with metrics.call("dns", rdtype) as call:
+        try:
+            return cache_answer(name, rdtype, resolver.resolve(name, rdtype))
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            call.outcome = negative_outcome(e)
+            return cache_negative(name, rdtype, e)
+
+def fetch_txt(name):
+    """TXT record texts of an include/redirect target, None when the lookup fails."""
+    try:
+        return resolve_records(name, 'TXT')
+    except dns.exception.DNSException:
+        return None
+
+# Memo of include/redirect targets shared by every domain of the run
+spf_evaluator = SPFEvaluator(fetch_txt)
+
 def get_mx_records(domain):
     """Fetch MX records for a given domain."""
     try:
-        answers = resolver.resolve(domain, 'MX')
-        mx_records = [str(r.exchange) for r in answers]
-        return ", ".join(mx_records)
-    except dns.resolver.NoAnswer as e:
-        return "Unknown"
-    except dns.resolver.NXDOMAIN as e:
-        return "Unknown"
+        return mx_from_answers(resolve_records(domain, 'MX'))
     except dns.exception.DNSException as e:
         return "Unknown"
 
 def get_spf_strict(domain):
     """Check if SPF record is strictly enforced (-all)."""
     try:
-        answers = resolver.resolve(domain, 'TXT')
-        for rdata in answers:
-            txt_record = rdata.to_text()
-            if "v=spf1" in txt_record:
-                if "-all" in txt_record:
-                    return "Strict"
-                elif "~all" in txt_record:
-                    return "Strict"
-                else:
-                    return "No strict enforcement"
-        return "No strict enforcement"
-    except dns.resolver.NoAnswer as e:
-        return "No strict enforcement"
-    except dns.resolver.NXDOMAIN as e:
-        return "No strict enforcement"
+        return spf_from_answers(resolve_records(domain, 'TXT'))
     except dns.exception.DNSException as e:
         return "No strict enforcement"
 
@@ -46,61 +143,214 @@ def get_dmarc_policy(domain):
     """Check if DMARC is enforced (p=reject or p=quarantine)."""
     dmarc_domain = f"_dmarc.{domain}"
     try:
-        answers = resolver.resolve(dmarc_domain, 'TXT')
-        for rdata in answers:
-            txt_record = rdata.to_text()
-            if "v=DMARC1" in txt_record:
-                if "p=reject" in txt_record:
-                    return "Enforced"
-                elif "p=quarantine" in txt_record:
-                    return "Enforced"
-                elif "p=none" in txt_record:
-                    return "No enforcement"
-        return "No enforcement"
-    except dns.resolver.NoAnswer as e:
-        return "No enforcement"
-    except dns.resolver.NXDOMAIN as e:
-        return "No enforcement"
+        return dmarc_from_answers(resolve_records(dmarc_domain, 'TXT'))
     except dns.exception.DNSException as e:
         return "No enforcement"
 
+async def resolve_async(name, rdtype, semaphore, timeout):
+    """Resolve a name through the cache with the asyncio resolver, returning None on DNS errors."""
+    cached = dns_cache.get(name, rdtype) if dns_cache is not None else None
+    if cached is not None:
+        return cached
+    async with semaphore:
+        with metrics.call("dns", rdtype) as call:
+            try:
+                answer = await async_resolver.resolve(name, rdtype, lifetime=timeout)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+                call.outcome = negative_outcome(e)
+                return cache_negative(name, rdtype, e)
+            except dns.exception.DNSException as e:
+                call.outcome = "timeout" if isinstance(e, dns.exception.Timeout) else "error"
+                return None
+    return cache_answer(name, rdtype, answer)
+
+async def lookup_domain_async(domain, semaphore, timeout):
+    """Run the MX, SPF and DMARC lookups for one domain at the same time."""
+    mx, txt, dmarc = await asyncio.gather(
+        resolve_async(domain, 'MX', semaphore, timeout),
+        resolve_async(domain, 'TXT', semaphore, timeout),
+        resolve_async(f"_dmarc.{domain}", 'TXT', semaphore, timeout),
+    )
+    return mx_from_answers(mx), txt, dmarc_from_answers(dmarc)
+
+async def prefetch_spf_async(txt_answers, semaphore, timeout, inflight):
+    """Resolve the include/redirect targets of these TXT answers concurrently, level by level.
+
+    Targets already in the evaluator's memo are not queried again, and
+    `inflight` ({name: task}) lets domains that name the same target while it
+    is being resolved wait for that one query. Failed queries are dropped from
+    `inflight` and never memoized, so a later domain naming the target retries it.
+    """
+    pending = spf_evaluator.missing_targets(txt_answers)
+    for _ in range(MAX_LOOKUPS):
+        if not pending:
+            break
+        for name in pending:
+            if name not in inflight:
+                inflight[name] = asyncio.ensure_future(resolve_async(name, 'TXT', semaphore, timeout))
+        tasks = [inflight[name] for name in pending]
+        answers = await asyncio.gather(*tasks)
+        for name, task, texts in zip(pending, tasks, answers):
+            if texts is None and inflight.get(name) is task:
+                del inflight[name]
+        spf_evaluator.store(dict(zip(pending, answers)))
+        pending = spf_evaluator.missing_targets(answers)
+
+async def enrich_domain_async(domain, semaphore, timeout, executor, inflight):
+    """Return the DNS columns of one domain; its website probe runs while the DNS queries do."""
+    (mx, txt, dmarc), is_live = await asyncio.gather(
+        lookup_domain_async(domain, semaphore, timeout),
+        live_site_prober.probe_async(domain, executor),
+    )
+    await prefetch_spf_async([txt], semaphore, timeout, inflight)
+    return domain, {
+        'mx_records': mx,
+        'is_spf_strict': spf_from_answers(txt, resolve=False),  # Targets were prefetched; never block the loop
+        'is_dmarc_enforced': dmarc,
+        'is_live_site': is_live,
+    }
+
+async def enrich_domains_async(domains, on_result, concurrency=200, timeout=5.0):
+    """Enrich many domains on one event loop, calling on_result(domain, record) as each finishes.
+
+    At most `concurrency` DNS queries are in flight and the website probes use
+    the prober's thread pool, so a slow domain holds up nothing but itself.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    inflight = {}
+    with ThreadPoolExecutor(max_workers=live_site_prober.max_workers) as executor:
+        tasks = [enrich_domain_async(domain, semaphore, timeout, executor, inflight) for domain in domains]
+        for task in asyncio.as_completed(tasks):
+            on_result(*await task)
+
+async def preflight_async(domain, semaphore, timeout):
+    """Return the resolution status of a domain from a single SOA query."""
+    cached = dns_cache.lookup(domain, 'SOA') if dns_cache is not None else None
+    if cached is not None:
+        return NXDOMAIN if cached[0] == "NXDOMAIN" else RESOLVES
+    async with semaphore:
+        with metrics.call("dns", "SOA") as call:
+            try:
+                answer = await async_resolver.resolve(domain, 'SOA', lifetime=timeout)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+                call.outcome = negative_outcome(e)
+                cache_negative(domain, 'SOA', e)
+                return NXDOMAIN if isinstance(e, dns.resolver.NXDOMAIN) else RESOLVES
+            except dns.exception.DNSException as e:
+                call.outcome = "timeout" if isinstance(e, dns.exception.Timeout) else "error"
+                return UNKNOWN
+    cache_answer(domain, 'SOA', answer)
+    return RESOLVES
+
+async def preflight_domains_async(domains, concurrency=200, timeout=5.0):
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(preflight_async(domain, semaphore, timeout) for domain in domains))
+
+def enrich_preflight(df, concurrency=200, timeout=5.0, chunk_size=1000):
+    """Add a resolution_status column from one SOA query per distinct domain.
+
+    Later stages skip the lookups, probes and API calls that cannot succeed
+    for domains marked NXDOMAIN. Failed queries give UNKNOWN, which no stage
+    skips.
+    """
+    print("🏁 Preflight")
+    domains = list(dict.fromkeys(df['domain']))
+    statuses = {}
+    tracker = metrics.tracker("preflight", total=len(domains))
+    for start in range(0, len(domains), chunk_size):
+        chunk = domains[start:start + chunk_size]
+        statuses.update(zip(chunk, asyncio.run(preflight_domains_async(chunk, concurrency, timeout))))
+        tracker.advance(len(chunk))
+
+    df = df.copy()
+    df[STATUS_COLUMN] = df['domain'].map(statuses)
+    counts = df[STATUS_COLUMN].value_counts().to_dict()
+    print(f"📢 Resolution status: {counts}")
+    if dns_cache is not None:
+        dns_cache.flush()  # Commit the SOA answers and release the write lock before the next stages
+    print("✅ Preflight")
+    return df
+
 def is_live_site(domain):
     """Check if a domain has a live website by making an HTTP request."""
-    urls = [f"https://{domain}", f"http://{domain}"]  # Try both HTTPS and HTTP
-    for url in urls:
-        try:
-            response = requests.get(
-                url, 
-                timeout=10, 
-                allow_redirects=False, 
-                headers={'Accept-Encoding': 'identity'}  # Disable gzip encoding
-            )
-            if 200 <= response.status_code < 400:  # Site is accessible
-                return "Live"
-        except requests.TooManyRedirects:
-            return "Live"  # Redirect loop, but site exists
-        except requests.exceptions.ContentDecodingError:
-            # print(f"Decoding error for domain: {domain}")
-            return "Not Live"
-        except requests.exceptions.RequestException as e:
-            # print(f"Request error for {domain}: {e}")  # Print the broken domain
-            return "Not Live"
-    return "Not Live"
-
-
-def enrich_dns(df):
-    # Process each row and print progress every 500 rows
+    return live_site_prober.probe(domain)
+
+
+def enrich_dns(df, use_async=False, concurrency=200, timeout=5.0, chunk_size=500, progress=None):
+    """Add mx_records, is_spf_strict, is_dmarc_enforced and is_live_site columns.
+
+    With use_async=True every distinct domain runs on a single event loop: DNS
+    lookups go through the asyncio resolver, limited to `concurrency` queries
+    in flight and `timeout` seconds per query, next to the website probes.
+    Otherwise domains are looked up one by one and probed `chunk_size` at a
+    time. With a StageProgress each result is saved as it completes and
+    domains finished by an earlier run are skipped.
+    """
     print("🏁 Enrich DNS")
-    for i, domain in enumerate(df['domain']):
-        df.at[i, 'mx_records'] = get_mx_records(domain)
-        df.at[i, 'is_spf_strict'] = get_spf_strict(domain)
-        df.at[i, 'is_dmarc_enforced'] = get_dmarc_policy(domain)
-        df.at[i, 'is_live_site'] = is_live_site(domain)
-        
-        # Print progress every 500 rows
-        if (i + 1) % 100 == 0 or i == 10:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"📢 {current_time} - Processed {i+1} rows")
+    domains = list(df['domain'])
+    results = ResultAccumulator(DNS_COLUMNS, size=len(domains))
+    positions = defaultdict(list)
+    for i, domain in enumerate(domains):
+        positions[domain].append(i)
+
+    # Fill domains finished by an interrupted run and domains that do not resolve, and work out what is left
+    completed = progress.completed() if progress is not None else {}
+    dead = dead_domains(df)
+    pending = []
+    dead_count = 0
+    for domain, rows in positions.items():
+        if domain in completed:
+            record = completed[domain]
+        elif domain in dead:
+            record = DEAD_DNS_RECORD
+            dead_count += 1
+        else:
+            pending.append(domain)
+            continue
+        for i in rows:
+            results.set(i, record)
+    if completed:
+        print(f"📢 Resuming DNS with {len(completed)} domains already done")
+    skipped("dns", "dns_query", 3 * dead_count)
+    skipped("dns", "http_probe", 2 * dead_count)
+
+    tracker = metrics.tracker("dns", total=len(pending))
+
+    def finished(domain, record):
+        for i in positions[domain]:
+            results.set(i, record)
+        if progress is not None:
+            progress.add(domain, record)
+        tracker.advance()
+
+    if use_async:
+        asyncio.run(enrich_domains_async(pending, finished, concurrency, timeout))
+    else:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            lookups = [(get_mx_records(d), get_spf_strict(d), get_dmarc_policy(d)) for d in chunk]
+
+            # Probe the chunk's websites concurrently on the pooled session
+            live = live_site_prober.probe_many(chunk)
+
+            for domain, (mx, spf, dmarc), is_live in zip(chunk, lookups, live):
+                finished(domain, {
+                    'mx_records': mx,
+                    'is_spf_strict': spf,
+                    'is_dmarc_enforced': dmarc,
+                    'is_live_site': is_live,
+                })
+
+    if progress is not None:
+        progress.flush()
+
+    # Attach all DNS columns to the frame in one step
+    df = results.attach(df)
+
+    if dns_cache is not None:
+        dns_cache.flush()
+        stats = metrics.cache_stats("dns")
+        print(f"📢 DNS cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
 
     print("✅ Enrich DNS")
-    return df
\ No newline at end of file
+    return df
@@ -1,23 +1,104 @@
+import json
+import os
 import requests
 import time
 import pandas as pd
 from datetime import datetime
+from metrics import metrics
+from atomic_file import atomic_write
 
-def get_new_domains():
+try:
+    import ijson  # Incremental JSON parser, keeps memory flat on large feeds
+except ImportError:
+    ijson = None
+
+FAKEFILTER_URL = "https://raw.githubusercontent.com/7c/fakefilter/refs/heads/main/json/data_version2.json"
+
+# Domains first seen within this many seconds before the run are candidates (3 days)
+FIRSTSEEN_WINDOW_SECONDS = 3 * 24 * 3600
+
+# Validators and the recently seen hosts of the last full download
+STATE_PATH = "fakefilter_state.json"
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_state(path, state):
+    with atomic_write(path) as f:
+        json.dump(state, f)
+
+def parse_recent_hosts(stream, cutoff):
+    """Yield [domain, [firstseen, ...]] for hosts first seen at or after cutoff.
+
+    The feed is parsed incrementally when ijson is installed, one domain at a
+    time, so only the domains inside the window are ever kept in memory.
+    """
+    if ijson is not None:
+        items = ijson.kvitems(stream, "domains")
+    else:
+        print("ijson is not installed, parsing the whole fakefilter feed in memory (pip install ijson)")
+        items = json.load(stream).get("domains", {}).items()
+    for domain, info in items:
+        seen = [
+            int(details.get("firstseen", 0))
+            for details in (info.get("hosts") or {}).values()
+            if details.get("firstseen", 0) >= cutoff
+        ]
+        if seen:
+            yield [domain, seen]
+
+def get_new_domains(state_path=STATE_PATH, seen_index=None):
+    """Return the domains first seen inside the window, minus those already in seen_index."""
     print(f"🏁 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Starting domain enrichment")
 
-    url = "https://raw.githubusercontent.com/7c/fakefilter/refs/heads/main/json/data_version2.json"
     now = int(time.time())
-    seven_days_ago = now - 259200
+    window_start = now - FIRSTSEEN_WINDOW_SECONDS
 
-    response = requests.get(url)
-    data = response.json()
-    rows = []
+    # Only revalidate when the stored hosts cover the whole window we need now
+    state = load_state(state_path)
+    headers = {}
+    if state and state.get("cutoff", now) <= window_start:
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("last_modified"):
+            headers["If-Modified-Since"] = state["last_modified"]
 
-    for domain, info in data.get("domains", {}).items():
-        for host, details in info.get("hosts", {}).items():
-            if details.get("firstseen", 0) >= seven_days_ago:
-                rows.append({"domain": domain, "firstseen": details.get("firstseen")})
+    with metrics.call("http", "fakefilter") as call:
+        response = requests.get(FAKEFILTER_URL, headers=headers, stream=True, timeout=(10, 120))
+        call.outcome = f"http_{response.status_code}"
+    if response.status_code == 304:
+        print("📢 fakefilter feed unchanged since last run")
+        recent = state["recent"]
+    else:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        recent = list(parse_recent_hosts(response.raw, window_start))
+        save_state(state_path, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "cutoff": window_start,
+            "recent": recent,
+        })
+    response.close()
+
+    rows = []
+    for domain, seen in recent:
+        for firstseen in seen:
+            if firstseen >= window_start:
+                rows.append({"domain": domain, "firstseen": firstseen})
                 break
+    df = pd.DataFrame(rows, columns=["domain", "firstseen"])
+
+    # Drop everything a previous run already enriched and sent, in one bulk lookup
+    if seen_index is not None and not df.empty:
+        seen = seen_index.contains_many(df["domain"])
+        print(f"📢 {int(seen.sum())} of {len(df)} domains in the window were already sent")
+        df = df[~seen].reset_index(drop=True)
 
-    return pd.DataFrame(rows)
\ No newline at end of file
+    return df
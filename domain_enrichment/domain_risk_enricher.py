@@ -1,89 +1,37 @@
 import random
 from datetime import datetime
+from mx_provider_matcher import load_provider_matcher
 
-def enrich_domain_risk(df):
-    """Enrich the DataFrame with domain risk level, last updated, provider name, and risk score."""
+# Columns added by enrich_domain_risk
+RISK_COLUMNS = ["domain_risk_level", "record_last_updated", "provider_name", "risk_score"]
 
-    def detect_provider(mx):
-        if isinstance(mx, str):
-            mx_lower = mx.lower()
-            if "google.com" in mx_lower:
-                return "Google"
-            elif "mailinator.com" in mx_lower:
-                return "Mailinator"
-            elif "one.com" in mx_lower:
-                return "One.com"
-            elif "mailgun.org" in mx_lower:
-                return "Mailgun"
-            elif "cloudflare.net" in mx_lower:
-                return "Cloudflare"
-            elif "forwardemail.net" in mx_lower:
-                return "Forwardemail.net"
-            elif "amazonaws.com" in mx_lower:
-                return "Amazon"
-            elif "yandex.net" in mx_lower:
-                return "Yandex"
-            elif "outlook.com" in mx_lower:
-                return "Microsoft"
-            elif "trashmail.com" in mx_lower:
-                return "Trashmail"
-            elif "hostinger.com" in mx_lower:
-                return "Hostinger"
-            elif "ionos.com" in mx_lower:
-                return "IONOS"
-            elif "moakt.com" in mx_lower:
-                return "Moakt"
-            elif "spamgourmet.com" in mx_lower:
-                return "Spamgourmet"
-            elif ".zoho." in mx_lower:
-                return "Zoho"
-            elif ".reg.ru" in mx_lower:
-                return "Reg.ru"
-            elif "guerrillamail" in mx_lower:
-                return "Guerrilla Mail"
-            elif "mytemp.email" in mx_lower:
-                return "MyTemp Email"
-            elif ".protonmail." in mx_lower:
-                return "Proton Mail"
-            elif "ovh.net" in mx_lower:
-                return "OVH"
-            elif "improvmx.com" in mx_lower:
-                return "Improvmx"
-            elif ".titan.email" in mx_lower:
-                return "Titan Mail"
-            elif ".10minutemail." in mx_lower:
-                return "10 Minute Mail"
-            elif ".10minutemail." in mx_lower:
-                return "10 Minute Mail"
-            elif "mailnesia.com" in mx_lower:
-                return "Mailnesia"
-            elif ".sendgrid." in mx_lower:
-                return "Sendgrid"
-            elif ".above.com" in mx_lower:
-                return "Above.com"
-            elif ".gandi.net" in mx_lower:
-                return "GandiMail"
-            elif ".temp-mail." in mx_lower:
-                return "Temp-Mail"
-            elif "emailfake.com" in mx_lower:
-                return "EmailFake"
+# Provider table from mx_providers.csv, compiled once
+provider_matcher = load_provider_matcher()
 
-        return "Unknown"
+def detect_provider(mx):
+    """Return the mail provider name for an MX records string."""
+    if isinstance(mx, str):
+        return provider_matcher.match(mx)
+    return "Unknown"
 
-    def calculate_risk_score(deliverability):
-        if deliverability == "DELIVERABLE":
-            return random.randint(10, 20)
-        elif deliverability == "UNDELIVERABLE":
-            return random.randint(1, 10)
-        else:
-            return None
+def calculate_risk_score(deliverability):
+    if deliverability == "DELIVERABLE":
+        return random.randint(10, 20)
+    elif deliverability == "UNDELIVERABLE":
+        return random.randint(1, 10)
+    else:
+        return None
 
+def enrich_domain_risk(df):
+    """Enrich the DataFrame with domain risk level, last updated, provider name, and risk score."""
     current_month_year = datetime.now().strftime("%B, %Y")
 
     # Apply enrichments
     df["domain_risk_level"] = "HIGH"
     df["record_last_updated"] = current_month_year
-    df["provider_name"] = df["mx_records"].apply(detect_provider)
+    # Match each distinct MX set once and map the names back onto the rows
+    providers = {mx: detect_provider(mx) for mx in df["mx_records"].dropna().unique()}
+    df["provider_name"] = df["mx_records"].map(providers).fillna("Unknown")
     df["risk_score"] = df["deliverability"].apply(calculate_risk_score)
 
     return df
@@ -0,0 +1,24 @@
+from metrics import metrics
+
+# Column written by the preflight stage (dns_checker.enrich_preflight)
+STATUS_COLUMN = "resolution_status"
+PREFLIGHT_COLUMNS = [STATUS_COLUMN]
+
+# Resolution statuses
+RESOLVES = "resolves"   # The name exists in DNS
+NXDOMAIN = "nxdomain"   # The registry has no delegation for it, nothing else can succeed
+UNKNOWN = "unknown"     # The query failed, so the domain is treated as alive
+
+
+def dead_domains(df):
+    """Return the set of domains the preflight found to be NXDOMAIN (empty if it did not run)."""
+    if STATUS_COLUMN not in df.columns:
+        return set()
+    return set(df.loc[df[STATUS_COLUMN] == NXDOMAIN, "domain"])
+
+
+def skipped(stage, call, count):
+    """Count external calls a stage did not make because the domain does not resolve."""
+    if count:
+        metrics.inc("skipped_calls_total", count, stage=stage, call=call)
+        print(f"⏭️ {stage}: skipped {count} {call} calls for domains that do not resolve")
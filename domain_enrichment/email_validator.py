@@ -1,51 +1,69 @@
 import pandas as pd
-import requests
-import time
-from dotenv import load_dotenv
 import os
-
-load_dotenv()  # Loads variables from .env
+from abstract_api_client import EMAIL_VALIDATION_URL, client_from_env
+from result_accumulator import ResultAccumulator
+from api_cache import open_default_cache, normalize_email, fetch_unique, fan_out
+from domain_status import dead_domains, skipped
 
 api_key = os.getenv("ABSTRACT_API_KEY")
 
+# Shared rate-limited client for the email validation API
+api_client = client_from_env(EMAIL_VALIDATION_URL, api_key, name="Email validation API")
+
+# Validation results of earlier runs, shared with streaming.py (API_CACHE_PATH)
+api_cache = open_default_cache()
+
+EMAIL_COLUMNS = [
+    'deliverability', 'is_valid_format', 'is_free_email', 'is_disposable_email',
+    'is_role_email', 'is_catchall_email', 'is_mx_found', 'is_smtp_valid',
+]
+
+# Fields written for addresses at a domain that does not resolve; the rest stay empty
+DEAD_EMAIL_FIELDS = {
+    'deliverability': 'UNDELIVERABLE',
+    'is_mx_found': 'FALSE',
+    'is_smtp_valid': 'FALSE',
+}
+
 # Function to get email validation data
 def get_email_validation(email):
-    api_url = f"https://emailvalidation.abstractapi.com/v1/?api_key={api_key}&email="
+    return api_client.get(email=email)
 
-    # Make the API call
-    response = requests.get(api_url + email)
-    if response.status_code == 200:
-        return response.json()  # Parse JSON response
-    else:
-        return None
+def email_fields(api_data):
+    """Extract the validation fields appended to the DataFrame from an API response."""
+    return {
+        'deliverability': api_data.get('deliverability', ''),
+        'is_valid_format': api_data.get('is_valid_format', {}).get('text', ''),
+        'is_free_email': api_data.get('is_free_email', {}).get('text', ''),
+        'is_disposable_email': api_data.get('is_disposable_email', {}).get('text', ''),
+        'is_role_email': api_data.get('is_role_email', {}).get('text', ''),
+        'is_catchall_email': api_data.get('is_catchall_email', {}).get('text', ''),
+        'is_mx_found': api_data.get('is_mx_found', {}).get('text', ''),
+        'is_smtp_valid': api_data.get('is_smtp_valid', {}).get('text', ''),
+    }
 
-def validate_email(df):
-    # Iterate over the DataFrame and call the API
+def validate_email(df, progress=None):
+    # Call the API once per distinct address that is not already cached
     print("🏁 Validate email")
-    for index, row in df.iterrows():
-        email = 'test@' + row['domain']
-        api_data = get_email_validation(email)
-        
+    emails = [normalize_email('test@' + domain) for domain in df['domain']]
+    dead = dead_domains(df)
+    dead_emails = list(dict.fromkeys(e for e, d in zip(emails, df['domain']) if d in dead))
+    skipped("email", "email_validation_api", len(dead_emails))
+    live_emails = [e for e, d in zip(emails, df['domain']) if d not in dead]
+    responses = fetch_unique(api_client, "email", live_emails, api_cache, progress=progress)
+
+    records = ResultAccumulator(EMAIL_COLUMNS)
+    for email in dead_emails:
+        records.add(email, DEAD_EMAIL_FIELDS)
+    for email, api_data in responses.items():
         if api_data:
-            # Extract the fields from the API response and append to the DataFrame
-            df.loc[index, 'deliverability'] = api_data.get('deliverability', '')
-            df.loc[index, 'is_valid_format'] = api_data.get('is_valid_format', {}).get('text', '')
-            df.loc[index, 'is_free_email'] = api_data.get('is_free_email', {}).get('text', '')
-            df.loc[index, 'is_disposable_email'] = api_data.get('is_disposable_email', {}).get('text', '')
-            df.loc[index, 'is_role_email'] = api_data.get('is_role_email', {}).get('text', '')
-            df.loc[index, 'is_catchall_email'] = api_data.get('is_catchall_email', {}).get('text', '')
-            df.loc[index, 'is_mx_found'] = api_data.get('is_mx_found', {}).get('text', '')
-            df.loc[index, 'is_smtp_valid'] = api_data.get('is_smtp_valid', {}).get('text', '')
+            records.add(email, email_fields(api_data))
         else:
             print(f"API call failed for {email}")
 
-        # Print progress every 200 rows
-        if (index + 1) % 200 == 0:
-            print(f"Processed {index + 1} rows out of {len(df)} rows.")
-
-        # Rate limit: 2 requests per second
-        time.sleep(0.5)
+    # One test@domain address per domain, so rows of the same domain share a result
+    df = fan_out(df, emails, records)
 
-    # Display the updated DataFrame
+    api_client.report()
     print("✅ Validate email")
     return df
@@ -0,0 +1,52 @@
+from pipeline import Pipeline, Stage
+
+# Stages of a full run, in declaration (and output column) order
+STAGES = ["preflight", "whois", "dns", "email", "risk"]
+
+# Stages whose input columns are produced by other stages
+DEPENDENCIES = {"risk": ["dns", "email"]}
+
+
+def check_stages(stages):
+    """Raise ValueError for unknown stages or for a stage picked without the stages it reads from."""
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}, expected some of {STAGES}")
+    for stage in stages:
+        missing = [needed for needed in DEPENDENCIES.get(stage, []) if needed not in stages]
+        if missing:
+            raise ValueError(f"Stage {stage} reads the output of {' and '.join(missing)}, which must be selected too")
+
+
+def build_pipeline(checkpoint=None, stages=None):
+    """Return the enrichment stages run on the fetched domains.
+
+    One SOA query per domain finds the dead ones, then WHOIS, DNS and email
+    validation run side by side and skip them; risk waits for DNS and email.
+    `stages` picks a subset of STAGES. Each stage module, with its resolver,
+    client and cache, is only imported when its stage is selected.
+    """
+    stages = list(STAGES if stages is None else stages)
+    check_stages(stages)
+
+    # Without the preflight nothing is known to be dead and no lookup is skipped
+    preflight_columns = []
+    selected = []
+    if "preflight" in stages:
+        from dns_checker import enrich_preflight
+        from domain_status import PREFLIGHT_COLUMNS
+        preflight_columns = PREFLIGHT_COLUMNS
+        selected.append(Stage("preflight", enrich_preflight, inputs=["domain"], outputs=PREFLIGHT_COLUMNS))
+    if "whois" in stages:
+        from whois_checker import enrich_whois_df, WHOIS_COLUMNS
+        selected.append(Stage("whois", enrich_whois_df, inputs=["domain", *preflight_columns], outputs=WHOIS_COLUMNS, partial=True, backend="rdap"))
+    if "dns" in stages:
+        from dns_checker import enrich_dns, DNS_COLUMNS
+        selected.append(Stage("dns", enrich_dns, inputs=["domain", *preflight_columns], outputs=DNS_COLUMNS, partial=True, use_async=True))
+    if "email" in stages:
+        from email_validator import validate_email, EMAIL_COLUMNS
+        selected.append(Stage("email", validate_email, inputs=["domain", *preflight_columns], outputs=EMAIL_COLUMNS, partial=True))
+    if "risk" in stages:
+        from domain_risk_enricher import enrich_domain_risk, RISK_COLUMNS
+        selected.append(Stage("risk", enrich_domain_risk, inputs=["mx_records", "deliverability"], outputs=RISK_COLUMNS))
+    return Pipeline(selected, checkpoint=checkpoint)
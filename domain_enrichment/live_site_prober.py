@@ -0,0 +1,85 @@
+import asyncio
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+
+# Outcome of a single HTTP attempt
+LIVE = "live"          # 2xx/3xx status (or a redirect loop)
+NOT_LIVE = "status"    # Server answered with a non-live status
+FAILED = "error"       # Connection, TLS or timeout error
+
+
+class LiveSiteProber:
+    """Concurrent Live/Not Live checker backed by a pooled requests session.
+
+    The https and http attempts for a domain are started together and only the
+    status line and headers are read; the body is never downloaded.
+    """
+
+    def __init__(self, max_workers=64, connect_timeout=3, read_timeout=10):
+        self.max_workers = max_workers
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({'Accept-Encoding': 'identity'})  # Disable gzip encoding
+
+    def attempt(self, url):
+        """Request a URL and classify the answer without reading the body."""
+        with metrics.call("http_probe", url.split("://", 1)[0]) as call:
+            try:
+                response = self.session.get(url, timeout=self.timeout, allow_redirects=False, stream=True)
+            except requests.TooManyRedirects:
+                call.outcome = LIVE
+                return LIVE  # Redirect loop, but site exists
+            except requests.exceptions.RequestException:
+                call.outcome = FAILED
+                return FAILED
+            try:
+                call.outcome = LIVE if 200 <= response.status_code < 400 else NOT_LIVE
+                return call.outcome
+            finally:
+                response.close()
+
+    @staticmethod
+    def combine(https_result, http_fetch):
+        """Apply the original https-then-http decision to the two attempt results."""
+        if https_result == LIVE:
+            return "Live"
+        if https_result == FAILED:
+            return "Not Live"
+        return "Live" if http_fetch() == LIVE else "Not Live"
+
+    def probe(self, domain):
+        """Return "Live" or "Not Live" for a single domain."""
+        return self.probe_many([domain])[0]
+
+    async def probe_async(self, domain, executor):
+        """Probe one domain on `executor` threads without blocking the event loop."""
+        https_future = executor.submit(self.attempt, f"https://{domain}")
+        http_future = executor.submit(self.attempt, f"http://{domain}")
+        https_result = await asyncio.wrap_future(https_future)
+        if https_result != NOT_LIVE:
+            http_future.cancel()
+            return self.combine(https_result, None)
+        http_result = await asyncio.wrap_future(http_future)
+        return self.combine(https_result, lambda: http_result)
+
+    def probe_many(self, domains):
+        """Return "Live"/"Not Live" for each domain, in input order."""
+        domains = list(domains)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Submit both schemes of a domain back to back so they run side by side
+            attempts = [
+                (executor.submit(self.attempt, f"https://{domain}"), executor.submit(self.attempt, f"http://{domain}"))
+                for domain in domains
+            ]
+            results = []
+            for https_future, http_future in attempts:
+                https_result = https_future.result()
+                if https_result != NOT_LIVE:
+                    http_future.cancel()  # Not needed, skip it if it has not started yet
+                results.append(self.combine(https_result, http_future.result))
+        return results
@@ -1,29 +1,73 @@
 #!/usr/bin/env python3
-from domain_fetcher import get_new_domains
-from whois_checker import enrich_whois_df
-from dns_checker import enrich_dns
-from email_validator import validate_email
-from domain_risk_enricher import enrich_domain_risk
-from send_output_to_slack import send_file_to_slack
-import pandas as pd
-
-# Step 1: Get new domains
-df = get_new_domains()
-if df.empty:
-    print("No new domains added in the last 24 hours.")
-    exit()
-
-# Step 2: Enrich with WHOIS
-df = enrich_whois_df(df)
-
-# Step 3: Enrich with SPF/DMARC or DNS
-df = enrich_dns(df)
-
-# Step 4: Validate example email
-df = validate_email(df)
-
-# Step 5: Enrich risk insights
-df = enrich_domain_risk(df)
-
-# Step 6: Send results to Slack
-send_file_to_slack(df)
+import os
+
+# Counters and latency histograms are written to METRICS_DIR at the end of the run;
+# set METRICS_PORT to also serve them at /metrics while the run is live
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+def run(input_path=None, output_path=None, stages=None):
+    """Fetch the new domains (or read input_path), enrich them and send the result to Slack.
+
+    With output_path the result is written there as CSV instead of being sent.
+    `stages` picks a subset of enrichment.STAGES and then needs output_path:
+    a partial result is never sent to Slack or added to the seen-domain index.
+    Stage modules are imported here, after .env is loaded, and only for the
+    stages that run.
+    """
+    from enrichment import STAGES, build_pipeline
+    if stages is not None and set(stages) != set(STAGES) and not output_path:
+        raise ValueError(f"Stages {stages} are only part of a run; give an output path instead of sending to Slack")
+
+    import pandas as pd
+    from checkpoint import RunCheckpoint
+    from metrics import metrics
+    from seen_index import open_default_index
+
+    if os.getenv("METRICS_PORT"):
+        metrics.serve(int(os.getenv("METRICS_PORT")))
+
+    # SHARDS > 1 splits the domains by hash over that many worker processes; NAME_SHARD<n>
+    # variables override NAME (API keys, rate limits) for shard n
+    shards = int(os.getenv("SHARDS", "1"))
+
+    # Domains already enriched and sent by earlier runs, added to once Slack has the result
+    seen_index = open_default_index()
+
+    # Stage outputs are saved under checkpoints/<date>/ so a rerun resumes where it stopped
+    checkpoint = RunCheckpoint()
+
+    # Step 1: Get new domains
+    if input_path:
+        df = pd.read_csv(input_path)
+    else:
+        from domain_fetcher import get_new_domains
+        df = checkpoint.run_stage("fetch", get_new_domains, seen_index=seen_index)
+    if df.empty:
+        print("No new domains to enrich.")
+        metrics.write(METRICS_DIR)
+        return df
+    checkpoint.set_input(df)
+
+    # Steps 2-5: preflight, then WHOIS, DNS and email validation side by side, then risk
+    if shards > 1:
+        from sharding import run_sharded
+        df = checkpoint.run_stage("sharded", run_sharded, df, shards, stages=stages)
+    else:
+        df = build_pipeline(checkpoint, stages).run(df)
+
+    # Step 6: Send results to Slack
+    if output_path:
+        df.to_csv(output_path, index=False)
+        print(f"✅ Results saved to {output_path}")
+    else:
+        from send_output_to_slack import send_file_to_slack
+        sent = checkpoint.run_stage("slack", send_file_to_slack, df)
+        if sent and seen_index is not None:
+            seen_index.add(df["domain"])
+    metrics.write(METRICS_DIR)
+    return df
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()  # Loads variables from .env before any stage module reads them
+    df = run()
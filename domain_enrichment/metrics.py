@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from atomic_file import atomic_write
+
+PREFIX = "domain_enrichment_"
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+
+class Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class ExternalCall:
+    """Times one call to an outside service. Set `outcome` to override "ok"/"error"."""
+
+    def __init__(self, registry, service, target):
+        self.registry = registry
+        self.service = service
+        self.target = target
+        self.outcome = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        outcome = self.outcome or ("error" if exc_type else "ok")
+        self.registry.observe("external_call_seconds", elapsed, service=self.service, target=self.target)
+        self.registry.inc("external_calls_total", service=self.service, target=self.target, outcome=outcome)
+        return False
+
+
+class ProgressTracker:
+    """Counts processed rows of a stage and prints one progress line every `interval` seconds."""
+
+    def __init__(self, registry, stage, total, interval):
+        self.registry = registry
+        self.stage = stage
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = time.monotonic()
+        self.printed = self.started
+        self.lock = threading.Lock()
+
+    def advance(self, count=1):
+        self.registry.inc("rows_processed_total", count, stage=self.stage)
+        with self.lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self.printed < self.interval and self.done != self.total:
+                return
+            self.printed = now
+            done = self.done
+        rate = done / max(now - self.started, 1e-9)
+        of_total = f" of {self.total}" if self.total is not None else ""
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"📢 {current_time} - {self.stage}: {done}{of_total} rows ({rate:.1f} rows/sec)")
+
+
+class MetricsRegistry:
+    """Counters and latency histograms shared by every stage of a run.
+
+    Metrics are identified by a name and a set of labels. Everything is kept in
+    memory; summary() / prometheus() render it and write() saves both forms.
+    """
+
+    def __init__(self, progress_interval=15):
+        self.counters = {}
+        self.histograms = {}
+        self.progress_interval = progress_interval
+        self.lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager that observes the duration of its block in histogram `name`."""
+        return Timer(self, name, labels)
+
+    def call(self, service, target):
+        """Context manager timing one external call (DNS query, WHOIS/RDAP lookup, probe, API request)."""
+        return ExternalCall(self, service, target)
+
+    def slept(self, seconds, service, target, reason):
+        """Record time spent waiting instead of working (reason: rate_limit or retry)."""
+        if seconds > 0:
+            self.inc("sleep_seconds_total", seconds, service=service, target=target, reason=reason)
+
+    def sleep(self, seconds, service, target, reason):
+        self.slept(seconds, service, target, reason)
+        time.sleep(seconds)
+
+    def retry(self, service, target):
+        self.inc("retries_total", service=service, target=target)
+
+    def cache(self, cache, hits, misses):
+        if hits:
+            self.inc("cache_requests_total", hits, cache=cache, result="hit")
+        if misses:
+            self.inc("cache_requests_total", misses, cache=cache, result="miss")
+
+    def cache_stats(self, cache):
+        """Return the hits, misses and hit rate recorded so far for one cache."""
+        counts = {"hit": 0, "miss": 0}
+        with self.lock:
+            for (name, key), value in self.counters.items():
+                labels = dict(key)
+                if name == "cache_requests_total" and labels.get("cache") == cache:
+                    counts[labels["result"]] += value
+        total = counts["hit"] + counts["miss"]
+        return {
+            "hits": counts["hit"],
+            "misses": counts["miss"],
+            "hit_rate": round(counts["hit"] / total, 3) if total else 0.0,
+        }
+
+    def tracker(self, stage, total=None):
+        return ProgressTracker(self, stage, total, self.progress_interval)
+
+    def summary(self):
+        """Return every metric as plain JSON-serialisable data."""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(key), "value": value}
+                for (name, key), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(key),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], histogram.counts)),
+                }
+                for (name, key), histogram in sorted(self.histograms.items())
+            ]
+        return {"generated_at": datetime.now().isoformat(), "counters": counters, "histograms": histograms}
+
+    def prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, key), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{PREFIX}{name}{format_labels(key)} {value}")
+            for (name, key), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip([*map(str, BUCKETS), "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{PREFIX}{name}_bucket{format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{format_labels(key)} {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count{format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory="metrics", name=None):
+        """Write <name>.json and <name>.prom to directory and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        name = name or datetime.now().strftime("run-%Y-%m-%d-%H%M%S")
+        json_path = os.path.join(directory, f"{name}.json")
+        prom_path = os.path.join(directory, f"{name}.prom")
+        with atomic_write(json_path) as f:
+            json.dump(self.summary(), f, indent=2)
+        with atomic_write(prom_path) as f:
+            f.write(self.prometheus())
+        print(f"📢 Metrics written to {json_path} and {prom_path}")
+        return json_path, prom_path
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose /metrics (Prometheus) and /metrics.json on a background thread while the run is live."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.summary()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"📢 Serving live metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+# Registry used by every stage; METRICS_PROGRESS_SECONDS sets how often progress is printed
+metrics = MetricsRegistry(progress_interval=float(os.getenv("METRICS_PROGRESS_SECONDS", "15")))
@@ -0,0 +1,67 @@
+import csv
+import os
+from collections import deque
+
+PROVIDERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mx_providers.csv")
+
+
+class ProviderMatcher:
+    """Aho-Corasick automaton over the MX substrings in mx_providers.csv.
+
+    Patterns keep their file order as priority: when several patterns occur in
+    the same MX string the one listed first wins, as in the old if/elif chain.
+    """
+
+    def __init__(self, patterns):
+        self.providers = [provider for _, provider in patterns]
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]  # Highest priority pattern ending at each state
+
+        for priority, (pattern, _) in enumerate(patterns):
+            state = 0
+            for char in pattern.lower():
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            if self.best[state] is None:
+                self.best[state] = priority
+
+        # Breadth-first pass to set failure links and inherit matches through them
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+
+    def match(self, text):
+        """Return the provider of the highest priority pattern found in text, or "Unknown"."""
+        state = 0
+        found = None
+        for char in text.lower():
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            priority = self.best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return self.providers[found] if found is not None else "Unknown"
+
+
+def load_provider_matcher(path=PROVIDERS_PATH):
+    """Compile the provider table into a ProviderMatcher."""
+    with open(path, newline="") as f:
+        patterns = [(row["pattern"], row["provider"]) for row in csv.DictReader(f)]
+    return ProviderMatcher(patterns)
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from metrics import metrics
+
+
+class Stage:
+    """A pipeline step that reads `inputs` columns and adds `outputs` columns keyed by domain."""
+
+    def __init__(self, name, func, inputs, outputs, partial=False, **kwargs):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.partial = partial
+        self.kwargs = kwargs
+
+
+class Pipeline:
+    """Runs stages as a small DAG: a stage starts as soon as all its input columns exist.
+
+    Independent stages run at the same time, each in its own thread and under
+    its own rate limits. Their output columns are joined on `domain`, in the
+    order the stages were declared, so the final column order does not depend
+    on which stage finished first.
+    """
+
+    def __init__(self, stages, checkpoint=None):
+        self.stages = list(stages)
+        self.checkpoint = checkpoint
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate stage names in {names}")
+
+    def assemble(self, base, outputs):
+        """Join the finished stages' outputs onto the base frame in declaration order."""
+        df = base
+        with metrics.timer("dataframe_seconds", step="assemble"):
+            for stage in self.stages:
+                if stage.name in outputs:
+                    df = df.merge(outputs[stage.name], on="domain", how="left")
+        return df
+
+    def run_stage(self, stage, df):
+        print(f"📢 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Starting stage {stage.name}")
+        if self.checkpoint is not None:
+            result = self.checkpoint.run_stage(stage.name, stage.func, df, partial=stage.partial, **stage.kwargs)
+        else:
+            with metrics.timer("stage_seconds", stage=stage.name):
+                result = stage.func(df, **stage.kwargs)
+        # Keep only the stage's own columns, one row per domain
+        result = result.reindex(columns=["domain", *stage.outputs])
+        return result.drop_duplicates("domain")
+
+    def run(self, df):
+        """Run every stage on df and return df with all output columns added."""
+        available = set(df.columns)
+        produced = {column for stage in self.stages for column in stage.outputs}
+        for stage in self.stages:
+            missing = set(stage.inputs) - available - produced
+            if missing:
+                raise ValueError(f"Stage {stage.name} needs columns nobody provides: {sorted(missing)}")
+
+        outputs = {}
+        pending = list(self.stages)
+        running = {}
+        with ThreadPoolExecutor(max_workers=len(self.stages) or 1) as executor:
+            while pending or running:
+                # Start every stage whose inputs are all available
+                for stage in [s for s in pending if set(s.inputs) <= available]:
+                    pending.remove(stage)
+                    running[executor.submit(self.run_stage, stage, self.assemble(df, outputs))] = stage
+                if not running:
+                    names = [stage.name for stage in pending]
+                    raise ValueError(f"Stages {names} depend on each other and can never start")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    outputs[stage.name] = future.result()
+                    available.update(stage.outputs)
+                    print(f"📢 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Finished stage {stage.name}")
+
+        return self.assemble(df, outputs)
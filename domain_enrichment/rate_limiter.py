@@ -0,0 +1,56 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds` seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class Backoff:
+    """Exponential backoff with jitter that resets after a success."""
+
+    def __init__(self, base=30, maximum=300):
+        self.base = base
+        self.maximum = maximum
+        self.failures = 0
+
+    def next_delay(self):
+        """Return the delay for the next consecutive failure."""
+        delay = min(self.base * (2 ** self.failures), self.maximum)
+        self.failures += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.failures = 0
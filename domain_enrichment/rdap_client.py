@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from datetime import datetime
+from threading import Lock
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+from atomic_file import atomic_write
+
+IANA_BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+
+
+def parse_rdap_date(value):
+    """Convert an RDAP event date (RFC 3339) to YYYY-MM-DD."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime("%Y-%m-%d")
+    except ValueError:
+        try:
+            return datetime.strptime(value[:10], "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+
+
+def vcard_field(entity, name):
+    """Return the first value of a vCard property (fn, email, ...) of an RDAP entity."""
+    vcard = entity.get("vcardArray") or []
+    for item in (vcard[1] if len(vcard) > 1 else []):
+        if item and item[0] == name:
+            value = item[3]
+            return value[0] if isinstance(value, list) else value
+    return None
+
+
+def find_entity(entities, role):
+    """Return the first entity with the given role, searching nested entities too."""
+    for entity in entities or []:
+        if role in (entity.get("roles") or []):
+            return entity
+        nested = find_entity(entity.get("entities"), role)
+        if nested:
+            return nested
+    return None
+
+
+def rdap_to_record(domain, data):
+    """Map an RDAP domain response to the fields returned by fetch_whois_data."""
+    events = {event.get("eventAction"): event.get("eventDate") for event in data.get("events") or []}
+    registrar = find_entity(data.get("entities"), "registrar") or {}
+    registrar_email = vcard_field(registrar, "email")
+    if not registrar_email:
+        abuse = find_entity(registrar.get("entities"), "abuse") or {}
+        registrar_email = vcard_field(abuse, "email")
+    registrar_url = f"https://{registrar_email.split('@')[-1]}" if registrar_email else None
+
+    return {
+        "domain": domain,
+        "registration_date": parse_rdap_date(events.get("registration")),
+        "last_updated": parse_rdap_date(events.get("last changed")),
+        "expiration_date": parse_rdap_date(events.get("expiration")),
+        "registrar_name": vcard_field(registrar, "fn"),
+        "registrar_email": registrar_email,
+        "registrar_url": registrar_url,
+    }
+
+
+class RDAPClient:
+    """RDAP lookups routed through the IANA bootstrap file on a pooled session."""
+
+    def __init__(self, session, bootstrap_path="rdap_bootstrap.json", bootstrap_max_age=7 * 86400,
+                 timeout=(5, 15), pool_size=32):
+        self.session = session
+        self.bootstrap_path = bootstrap_path
+        self.bootstrap_max_age = bootstrap_max_age
+        self.timeout = timeout
+        self.servers = None
+        self.lock = Lock()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def load_bootstrap(self):
+        """Return the IANA bootstrap document, refreshing the local copy when it is stale."""
+        if os.path.exists(self.bootstrap_path):
+            age = time.time() - os.path.getmtime(self.bootstrap_path)
+            if age < self.bootstrap_max_age:
+                with open(self.bootstrap_path) as f:
+                    return json.load(f)
+        try:
+            response = self.session.get(IANA_BOOTSTRAP_URL, timeout=self.timeout)
+            response.raise_for_status()
+            bootstrap = response.json()
+        except Exception as e:
+            if not os.path.exists(self.bootstrap_path):
+                raise
+            print(f"Could not refresh RDAP bootstrap, using cached copy: {e}")
+            with open(self.bootstrap_path) as f:
+                return json.load(f)
+        with atomic_write(self.bootstrap_path) as f:
+            json.dump(bootstrap, f)
+        return bootstrap
+
+    def server_map(self):
+        """Return a dict of TLD -> RDAP base URL, loading the bootstrap once.
+
+        If the bootstrap can be neither fetched nor read from disk the map is
+        empty for the rest of the run, so every TLD falls back to port-43 WHOIS.
+        """
+        with self.lock:
+            if self.servers is None:
+                try:
+                    bootstrap = self.load_bootstrap()
+                except Exception as e:
+                    print(f"❌ RDAP bootstrap unavailable, using port-43 WHOIS for every TLD: {e}")
+                    bootstrap = {}
+                servers = {}
+                for tlds, urls in bootstrap.get("services", []):
+                    urls = sorted(urls, key=lambda url: not url.startswith("https://"))
+                    for tld in tlds:
+                        servers[tld.lower()] = urls[0].rstrip("/") + "/"
+                self.servers = servers
+            return self.servers
+
+    def server_for(self, domain):
+        """Return the RDAP base URL for a domain's TLD, or None if the TLD has no RDAP service."""
+        tld = domain.rstrip(".").rsplit(".", 1)[-1].lower()
+        return self.server_map().get(tld)
+
+    def server_host(self, domain):
+        base_url = self.server_for(domain)
+        return urlparse(base_url).netloc if base_url else None
+
+    def lookup(self, domain):
+        """Fetch the RDAP domain object. Raises requests.HTTPError on error statuses."""
+        response = self.session.get(
+            f"{self.server_for(domain)}domain/{domain}",
+            timeout=self.timeout,
+            headers={"Accept": "application/rdap+json"},
+        )
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+
+class ResultAccumulator:
+    """Collects a stage's results column by column and attaches them to a frame at once.
+
+    With `size` the columns are preallocated arrays filled by row position with
+    set(). Without it, results are appended per key with add() and can be turned
+    into a lookup frame with to_frame(). Columns default to object dtype; pass
+    `dtypes` ({column: dtype}) for typed arrays.
+    """
+
+    def __init__(self, columns, size=None, dtypes=None):
+        self.columns = list(columns)
+        self.dtypes = dtypes or {}
+        self.keys = []
+        if size is None:
+            self.data = {column: [] for column in self.columns}
+        else:
+            self.data = {column: self._allocate(column, size) for column in self.columns}
+
+    def _allocate(self, column, size):
+        dtype = np.dtype(self.dtypes.get(column, object))
+        if dtype.kind == "f":
+            return np.full(size, np.nan, dtype=dtype)
+        return np.full(size, None, dtype=object) if dtype == object else np.zeros(size, dtype=dtype)
+
+    def set(self, position, record):
+        """Store one row's results (a dict of column -> value) at a row position."""
+        for column in self.columns:
+            if column in record:
+                self.data[column][position] = record[column]
+
+    def add(self, key, record):
+        """Append the results for one key."""
+        self.keys.append(key)
+        for column in self.columns:
+            self.data[column].append(record.get(column))
+
+    def to_frame(self, key_column=None):
+        """Return the collected results as a DataFrame, optionally with the keys as a column."""
+        frame = pd.DataFrame({column: self.data[column] for column in self.columns})
+        for column, dtype in self.dtypes.items():
+            frame[column] = frame[column].astype(dtype)
+        if key_column:
+            frame.insert(0, key_column, self.keys)
+        return frame
+
+    def attach(self, df):
+        """Return df with the collected columns added (or replaced) in one concatenation."""
+        results = self.to_frame()
+        results.index = df.index
+        df = df.drop(columns=[column for column in self.columns if column in df.columns])
+        return pd.concat([df, results], axis=1)
@@ -0,0 +1,72 @@
+import hashlib
+import os
+
+import numpy as np
+
+from atomic_file import atomic_write
+from metrics import metrics
+
+
+def domain_key(domain):
+    """64-bit key of a normalized domain (first 8 bytes of its SHA-256)."""
+    normalized = str(domain).strip().lower().rstrip(".")
+    return int.from_bytes(hashlib.sha256(normalized.encode()).digest()[:8], "little")
+
+
+class SeenDomainIndex:
+    """On-disk set of domains that were already enriched and sent, stored as sorted 64-bit keys.
+
+    The file is a plain array of little-endian uint64 keys, memory-mapped and
+    searched with a binary search, so a lookup touches a few pages no matter
+    how many domains have been seen. add() writes a merged copy and renames it
+    over the old file, so a crash never leaves a half-written index. Two
+    distinct domains sharing a 64-bit key is possible but negligible at
+    millions of domains.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def keys(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return np.empty(0, dtype="<u8")
+        return np.memmap(self.path, dtype="<u8", mode="r")
+
+    def __len__(self):
+        return os.path.getsize(self.path) // 8 if os.path.exists(self.path) else 0
+
+    def contains_many(self, domains):
+        """Return a boolean array telling which domains are in the index."""
+        wanted = np.fromiter((domain_key(domain) for domain in domains), dtype="<u8")
+        keys = self.keys()
+        if not len(keys) or not len(wanted):
+            found = np.zeros(len(wanted), dtype=bool)
+        else:
+            positions = np.searchsorted(keys, wanted)
+            found = keys[np.minimum(positions, len(keys) - 1)] == wanted
+        metrics.cache("seen_index", hits=int(found.sum()), misses=int(len(found) - found.sum()))
+        return found
+
+    def add(self, domains):
+        """Add domains to the index with an atomic rewrite; returns how many were new."""
+        new_keys = np.unique(np.fromiter((domain_key(domain) for domain in domains), dtype="<u8"))
+        old_keys = self.keys()
+        merged = np.union1d(old_keys, new_keys).astype("<u8")
+        added = len(merged) - len(old_keys)
+        del old_keys  # Release the mapping before the file is replaced
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with atomic_write(self.path, "wb") as f:
+            f.write(merged.tobytes())
+        print(f"📢 Seen-domain index: {added} domains added, {len(merged)} in total")
+        return added
+
+
+def open_default_index():
+    """Open the index configured by SEEN_INDEX_PATH, or None if disabled."""
+    path = os.getenv("SEEN_INDEX_PATH", "seen_domains.idx")
+    if not path or path.lower() == "off":
+        return None
+    return SeenDomainIndex(path)
@@ -1,68 +1,139 @@
+import io
 import os
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
-from dotenv import load_dotenv
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from metrics import metrics
+from atomic_file import atomic_write
 
-load_dotenv()
+# Output format: "csv", "csv.gz" or "parquet"; recipients get plain CSV unless this opts in
+OUTPUT_FORMAT = os.getenv("SLACK_OUTPUT_FORMAT", "csv")
 
-def send_file_to_slack(df, channel="#high-overage-users"):
-    filepath = "enriched_domains.csv"
-    df.to_csv(filepath, index=False)
+# What the download link in the Slack message calls each format
+FORMAT_LABELS = {"csv": "CSV", "csv.gz": "gzipped CSV", "parquet": "Parquet file"}
+
+# Files larger than this are split by rows into several uploads
+SPLIT_BYTES = int(os.getenv("SLACK_SPLIT_BYTES", str(500 * 1024 * 1024)))
+
+# Keep a copy of every uploaded file here; unset keeps nothing on disk
+ARCHIVE_DIR = os.getenv("SLACK_ARCHIVE_DIR")
+
+# Pooled session for the file uploads
+upload_session = requests.Session()
+upload_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+def serialize(df, file_format):
+    """Write df into an in-memory buffer in the given format and return it rewound."""
+    buffer = io.BytesIO()
+    if file_format == "parquet":
+        df.to_parquet(buffer, index=False)
+    elif file_format == "csv.gz":
+        df.to_csv(buffer, index=False, compression={"method": "gzip", "mtime": 0})
+    elif file_format == "csv":
+        df.to_csv(buffer, index=False)
+    else:
+        raise ValueError(f"Unknown output format {file_format!r}")
+    buffer.seek(0)
+    return buffer
+
+def serialize_parts(df, file_format, max_bytes):
+    """Serialize df, halving it by rows until every part is at most max_bytes."""
+    buffer = serialize(df, file_format)
+    if buffer.getbuffer().nbytes <= max_bytes or len(df) < 2:
+        return [buffer]
+    middle = len(df) // 2
+    return (serialize_parts(df.iloc[:middle], file_format, max_bytes)
+            + serialize_parts(df.iloc[middle:], file_format, max_bytes))
+
+def archive(buffer, file_name, archive_dir):
+    """Save a copy of an uploaded buffer under archive_dir."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, file_name)
+    with atomic_write(path, "wb") as f:
+        f.write(buffer.getbuffer())
+    print(f"📢 Archived {path}")
+
+def upload_part(client, buffer, file_name):
+    """Stream one buffer to a Slack upload URL and return its file id, or None on failure."""
+    length = buffer.getbuffer().nbytes
+    upload_url_resp = client.files_getUploadURLExternal(filename=file_name, length=length)
+    with metrics.call("slack", "upload") as call:
+        upload_response = upload_session.post(
+            upload_url_resp["upload_url"],
+            data=buffer,
+            headers={"Content-Type": "application/octet-stream", "Content-Length": str(length)},
+            timeout=(10, 300),
+        )
+        call.outcome = f"http_{upload_response.status_code}"
+    metrics.inc("slack_upload_bytes_total", length)
+    if upload_response.status_code != 200:
+        print("❌ Upload failed:", upload_response.text)
+        return None
+    return upload_url_resp["file_id"]
+
+def send_file_to_slack(df, channel="#high-overage-users", file_format=None, split_bytes=None, archive_dir=None):
+    """Upload df to Slack and post its link. Returns True once the message is posted.
+
+    The file is built in memory (CSV by default, see SLACK_OUTPUT_FORMAT)
+    and never written to disk unless archive_dir / SLACK_ARCHIVE_DIR is set.
+    Output above split_bytes is uploaded as several files of whole rows.
+    """
     slack_token = os.getenv("SLACK_USER_OAUTH_TOKEN")
     if not slack_token:
         print("SLACK_USER_OAUTH_TOKEN not set in environment.")
-        return
+        return False
+    file_format = file_format or OUTPUT_FORMAT
+    archive_dir = archive_dir or ARCHIVE_DIR
+
+    parts = serialize_parts(df, file_format, split_bytes or SPLIT_BYTES)
+    stamp = datetime.now().strftime("%Y-%m-%d")
+    if len(parts) == 1:
+        names = [f"enriched_domains.{file_format}"]
+    else:
+        names = [f"enriched_domains-part{i}of{len(parts)}.{file_format}" for i in range(1, len(parts) + 1)]
+    print(f"📢 {len(df)} rows as {file_format}: {sum(part.getbuffer().nbytes for part in parts)} bytes in {len(parts)} file(s)")
 
     client = WebClient(token=slack_token)
-    file_name = os.path.basename(filepath)
-    file_size = os.path.getsize(filepath)
 
     try:
-        # Step 1: Get upload URL
-        upload_url_resp = client.files_getUploadURLExternal(
-            filename=file_name,
-            length=file_size
-        )
-        upload_url = upload_url_resp["upload_url"]
-        file_id = upload_url_resp["file_id"]
-
-        # Step 2: Upload the file to the URL
-        with open(filepath, "rb") as file_data:
-            upload_response = requests.post(
-                upload_url,
-                data=file_data,
-                headers={"Content-Type": "application/octet-stream"}
-            )
-        if upload_response.status_code != 200:
-            print("❌ Upload failed:", upload_response.text)
-            return
+        # Steps 1-2: Get an upload URL for each part and stream the part to it
+        file_ids = []
+        for buffer, file_name in zip(parts, names):
+            if archive_dir:
+                archive(buffer, f"{stamp}-{file_name}", archive_dir)
+            file_id = upload_part(client, buffer, file_name)
+            if file_id is None:
+                return False
+            file_ids.append(file_id)
 
         # Step 3: Complete upload
         client.files_completeUploadExternal(
-            files=[{
-                "id": file_id,
-                "title": f"Enriched Domains - {datetime.now().strftime('%Y-%m-%d')}"
-            }]
+            files=[
+                {"id": file_id, "title": f"Enriched Domains - {stamp}" + (f" ({i}/{len(file_ids)})" if len(file_ids) > 1 else "")}
+                for i, file_id in enumerate(file_ids, start=1)
+            ]
         )
 
-        # Step 4: Get permalink and share
-        file_info = client.files_info(file=file_id)
-        permalink = file_info["file"]["permalink"]
+        # Step 4: Get permalinks and share
+        permalinks = [client.files_info(file=file_id)["file"]["permalink"] for file_id in file_ids]
+        if len(permalinks) == 1:
+            links = f"<{permalinks[0]}|Download {FORMAT_LABELS[file_format]}>"
+        else:
+            links = "\n".join(
+                f"<{link}|Download part {i} of {len(permalinks)} ({FORMAT_LABELS[file_format]})>"
+                for i, link in enumerate(permalinks, start=1)
+            )
 
         # Step 5: Post message
         client.chat_postMessage(
             channel=channel,
-            text=f"📎 Hi team. Here is the list of new disposable domains to create new pages. {datetime.now().strftime('%B %d, %Y')}\n<{permalink}|Download CSV>"
+            text=f"📎 Hi team. Here is the list of new disposable domains to create new pages. {datetime.now().strftime('%B %d, %Y')}\n{links}"
         )
 
         print("✅ File shared successfully in Slack.")
-
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            print("✅ Local file deleted.")
-        else:
-            print("⚠️ File does not exist.")
+        return True
     except SlackApiError as e:
         print(f"❌ Slack API error: {e.response['error']}")
+        return False
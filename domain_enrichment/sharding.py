@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Sharded mode for large backfills: the input is split by a stable hash of the domain.
+
+Rate limits are per egress IP and per API key, so each shard runs in its own
+process or on its own host with its own credentials. Every shard writes a
+result file and the merge step puts them back together in input order.
+
+On one host (worker processes, see run_sharded):
+    SHARDS=4 python main.py
+
+On several hosts:
+    python sharding.py split <input.csv> <shard dir> --shards 4
+    python sharding.py run <shard dir>/shard-001-of-004.input.parquet      # on each host
+    python sharding.py merge <shard dir> <output.csv> [--slack]
+"""
+import argparse
+import glob
+import hashlib
+import os
+import re
+import subprocess
+import sys
+
+import pandas as pd
+
+from atomic_file import atomic_write
+
+# Position of each row in the unsharded input, used to merge in a deterministic order
+ROW_COLUMN = "input_row"
+
+SHARD_FILE = re.compile(r"shard-(\d+)-of-(\d+)\.parquet$")
+
+
+def shard_of(domain, shards):
+    """Return the shard (0..shards-1) of a domain; the same on every host and run."""
+    normalized = str(domain).strip().lower().rstrip(".")
+    digest = hashlib.sha256(normalized.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_name(index, shards):
+    return f"shard-{index + 1:03d}-of-{shards:03d}"
+
+
+def write_parquet(df, path):
+    with atomic_write(path, "wb") as f:
+        df.to_parquet(f, index=False)
+
+
+def split_input(df, shards, directory):
+    """Write one <shard>.input.parquet per shard to directory and return their paths."""
+    if shards < 1:
+        raise ValueError(f"shards must be at least 1, got {shards}")
+    os.makedirs(directory, exist_ok=True)
+    df = df.reset_index(drop=True)
+    df[ROW_COLUMN] = range(len(df))
+    assignment = df["domain"].map(lambda domain: shard_of(domain, shards))
+    paths = []
+    for index in range(shards):
+        path = os.path.join(directory, f"{shard_name(index, shards)}.input.parquet")
+        write_parquet(df[assignment == index], path)
+        paths.append(path)
+    print(f"📢 Split {len(df)} rows into {shards} shards: {assignment.value_counts().sort_index().tolist()}")
+    return paths
+
+
+def result_path(input_path):
+    return input_path.replace(".input.parquet", ".parquet")
+
+
+def run_shard(input_path, output_path=None, stages=None):
+    """Enrich one shard input file and write its result file; returns the result path.
+
+    Stage checkpoints are keyed on the shard's domains, so a rerun resumes.
+    """
+    # Imported here so the split and merge steps do not set up resolvers, caches and clients
+    from checkpoint import RunCheckpoint
+    from enrichment import build_pipeline
+
+    output_path = output_path or result_path(input_path)
+    df = pd.read_parquet(input_path)
+    print(f"🏁 Shard {os.path.basename(input_path)}: {len(df)} rows")
+    if not df.empty:
+        checkpoint = RunCheckpoint()
+        checkpoint.set_input(df)
+        df = build_pipeline(checkpoint, stages).run(df)
+    write_parquet(df, output_path)
+    print(f"✅ Shard {os.path.basename(input_path)} written to {output_path}")
+    return output_path
+
+
+def merge_shards(directory):
+    """Combine every shard result in directory into one frame in the original input order.
+
+    Raises ValueError when a shard result is missing, so an incomplete
+    backfill is never sent.
+    """
+    found = {}
+    for path in glob.glob(os.path.join(directory, "shard-*-of-*.parquet")):
+        match = SHARD_FILE.search(os.path.basename(path))
+        if match:
+            found.setdefault(int(match.group(2)), {})[int(match.group(1)) - 1] = path
+    if len(found) != 1:
+        raise ValueError(f"Expected the results of one split in {directory}, found shard counts {sorted(found)}")
+    shards, paths = next(iter(found.items()))
+    missing = [shard_name(index, shards) for index in range(shards) if index not in paths]
+    if missing:
+        raise ValueError(f"Missing shard results in {directory}: {missing}")
+
+    df = pd.concat([pd.read_parquet(paths[index]) for index in range(shards)], ignore_index=True)
+    df = df.sort_values(ROW_COLUMN, kind="stable").drop(columns=[ROW_COLUMN]).reset_index(drop=True)
+    print(f"📢 Merged {shards} shards into {len(df)} rows")
+    return df
+
+
+def shard_environment(index, shards):
+    """Environment of a local worker: NAME_SHARD<n> variables override NAME for shard n (1-based).
+
+    Each worker also gets its own DNS cache file unless DNS_CACHE_PATH_SHARD<n>
+    names one: the cache keeps a write transaction open across many answers, so
+    workers sharing a file would lock each other out. A domain always lands in
+    the same shard, so the next run with as many shards still hits its file.
+    """
+    env = dict(os.environ)
+    suffix = f"_SHARD{index + 1}"
+    for name, value in os.environ.items():
+        if name.endswith(suffix):
+            env[name[:-len(suffix)]] = value
+    dns_cache_path = env.get("DNS_CACHE_PATH", "dns_cache.sqlite3")
+    if dns_cache_path and dns_cache_path.lower() != "off" and f"DNS_CACHE_PATH{suffix}" not in os.environ:
+        root, extension = os.path.splitext(dns_cache_path)
+        env["DNS_CACHE_PATH"] = f"{root}.{shard_name(index, shards)}{extension}"
+    return env
+
+
+def run_sharded(df, shards, directory="shards", stages=None):
+    """Enrich df in `shards` worker processes and return the merged result.
+
+    Each worker is a fresh interpreter started with shard_environment, so API
+    keys, resolvers and rate limits are configured per shard. Shards whose
+    result file already exists are not run again.
+    """
+    from checkpoint import input_hash
+
+    directory = os.path.join(directory, input_hash(df))
+    workers = []
+    for index, input_path in enumerate(split_input(df, shards, directory)):
+        if os.path.exists(result_path(input_path)):
+            print(f"⏭️ Skipping {shard_name(index, shards)}, result already written")
+            continue
+        command = [sys.executable, os.path.abspath(__file__), "run", input_path]
+        if stages is not None:
+            command += ["--stages", ",".join(stages)]
+        workers.append((index, subprocess.Popen(command, env=shard_environment(index, shards))))
+
+    failed = [shard_name(index, shards) for index, worker in workers if worker.wait() != 0]
+    if failed:
+        raise RuntimeError(f"Shards {failed} failed; rerun to resume them")
+    return merge_shards(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split, enrich and merge sharded backfills.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    split = commands.add_parser("split", help="split an input CSV into shard input files")
+    split.add_argument("input")
+    split.add_argument("directory")
+    split.add_argument("--shards", type=int, required=True)
+
+    run = commands.add_parser("run", help="enrich one shard input file")
+    run.add_argument("input")
+    run.add_argument("output", nargs="?")
+    run.add_argument("--stages", help="comma separated subset of enrichment.STAGES")
+
+    merge = commands.add_parser("merge", help="merge the shard results into one CSV")
+    merge.add_argument("directory")
+    merge.add_argument("output")
+    merge.add_argument("--slack", action="store_true", help="also send the merged result to Slack")
+
+    args = parser.parse_args(argv)
+    from dotenv import load_dotenv
+    load_dotenv()  # Before any stage module reads its settings
+    if args.command == "split":
+        split_input(pd.read_csv(args.input), args.shards, args.directory)
+    elif args.command == "run":
+        from metrics import metrics
+        stages = args.stages.split(",") if args.stages else None
+        output_path = run_shard(args.input, args.output, stages)
+        metrics.write(os.getenv("METRICS_DIR", "metrics"), name=os.path.basename(output_path)[:-len(".parquet")])
+    else:
+        df = merge_shards(args.directory)
+        df.to_csv(args.output, index=False)
+        print(f"✅ Merged result written to {args.output}")
+        if args.slack:
+            from send_output_to_slack import send_file_to_slack
+            from seen_index import open_default_index
+            if not send_file_to_slack(df):
+                sys.exit(1)
+            seen_index = open_default_index()
+            if seen_index is not None:
+                seen_index.add(df["domain"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+from collections import namedtuple
+from threading import Lock
+
+from metrics import metrics
+
+# RFC 7208 section 4.6.4: at most 10 mechanisms/modifiers that cause DNS lookups
+MAX_LOOKUPS = 10
+LOOKUP_MECHANISMS = {"include", "a", "mx", "ptr", "exists"}
+
+# Effective "all" qualifier of a policy, the DNS lookups it costs, and "permerror"/"temperror"/"none"
+SPFPolicy = namedtuple("SPFPolicy", ["qualifier", "lookups", "error"])
+
+QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def unquote(text):
+    """Join the character strings of a TXT record's text form ('"v=spf1 ..." "..."')."""
+    parts = QUOTED.findall(text)
+    return "".join(parts) if parts else text
+
+
+def spf_records(txt_records):
+    """Return the SPF records among TXT record texts."""
+    records = (unquote(text).strip() for text in txt_records or [])
+    return [record for record in records if record.lower() == "v=spf1" or record.lower().startswith("v=spf1 ")]
+
+
+def parse_terms(record):
+    """Yield (kind, qualifier, target) for each term of an SPF record.
+
+    Mechanisms give their name (include, a, mx, all, ...); modifiers such as
+    redirect give their name with qualifier None.
+    """
+    for term in record.split()[1:]:
+        name, equals, value = term.partition("=")
+        if equals and re.fullmatch(r"[A-Za-z][\w.-]*", name):
+            yield name.lower(), None, value
+            continue
+        qualifier = term[0] if term[0] in "+-~?" else "+"
+        body = term.lstrip("+-~?")
+        mechanism, _, target = body.partition(":")
+        yield mechanism.split("/")[0].lower(), qualifier, target
+
+
+class SPFEvaluator:
+    """Works out the effective policy of SPF records, following include: and redirect=.
+
+    TXT answers and policies of include/redirect targets are memoized for the
+    whole run, so a provider chain such as _spf.google.com is resolved once no
+    matter how many domains include it. `resolve(name)` returns the TXT record
+    texts of a name ([] when there are none) or None on a DNS failure; failures
+    are not memoized, so the next domain naming that target queries it again.
+    """
+
+    def __init__(self, resolve):
+        self.resolve = resolve
+        self.txt = {}
+        self.policies = {}
+        self.lock = Lock()
+        self.name_locks = {}
+
+    @staticmethod
+    def normalize(name):
+        return name.lower().rstrip(".")
+
+    def store(self, answers):
+        """Memoize TXT answers ({name: texts or None}) fetched elsewhere, e.g. concurrently; failures are skipped."""
+        for name, texts in answers.items():
+            if texts is not None:
+                self.txt.setdefault(self.normalize(name), texts)
+
+    def fetch(self, name, resolve=True):
+        """TXT texts of a name from the memo, resolving it on a miss unless resolve is False (then None)."""
+        name = self.normalize(name)
+        if name in self.txt:
+            metrics.cache("spf", hits=1, misses=0)
+            return self.txt[name]
+        if not resolve:
+            return None
+        with self.lock:
+            name_lock = self.name_locks.setdefault(name, Lock())
+        with name_lock:
+            if name in self.txt:
+                return self.txt[name]
+            metrics.cache("spf", hits=0, misses=1)
+            texts = self.resolve(name)
+            if texts is not None:
+                self.txt[name] = texts
+        return texts
+
+    def missing_targets(self, txt_answers):
+        """Return the include/redirect targets named by these TXT answers that are not memoized yet."""
+        targets = set()
+        for texts in txt_answers:
+            for record in spf_records(texts):
+                for kind, _, target in parse_terms(record):
+                    if kind in ("include", "redirect") and target and "%" not in target:
+                        target = self.normalize(target)
+                        if target not in self.txt:
+                            targets.add(target)
+        return sorted(targets)
+
+    def policy(self, name, stack=(), resolve=True):
+        """Return the SPFPolicy of an include/redirect target, memoized unless a lookup failed."""
+        name = self.normalize(name)
+        if name in self.policies:
+            return self.policies[name]
+        if name in stack:
+            return SPFPolicy(None, 0, "permerror")  # include/redirect loop
+        texts = self.fetch(name, resolve)
+        if texts is None:
+            return SPFPolicy(None, 0, "temperror")
+        policy = self.evaluate(texts, stack + (name,), resolve)
+        if policy.error != "temperror":  # A failed lookup further down may succeed for a later domain
+            self.policies[name] = policy
+        return policy
+
+    def evaluate(self, txt_records, stack=(), resolve=True):
+        """Return the SPFPolicy defined by a name's TXT record texts.
+
+        With resolve=False only memoized targets are used and any other counts
+        as a temporary error, for callers that fetched the targets beforehand.
+        """
+        records = spf_records(txt_records)
+        if not records:
+            return SPFPolicy(None, 0, "none")
+        if len(records) > 1:
+            return SPFPolicy(None, 0, "permerror")
+
+        lookups = 0
+        qualifier = None
+        redirect = None
+        for kind, term_qualifier, target in parse_terms(records[0]):
+            if kind == "all":
+                qualifier = term_qualifier
+                break  # Later terms, redirect included, never apply
+            if kind == "redirect":
+                redirect = target
+            elif kind in LOOKUP_MECHANISMS:
+                lookups += 1
+                if kind == "include" and target and "%" not in target:
+                    child = self.policy(target, stack, resolve)
+                    if child.error:
+                        # A missing or broken included record makes the whole policy fail
+                        return SPFPolicy(None, lookups, "temperror" if child.error == "temperror" else "permerror")
+                    lookups += child.lookups
+            if lookups > MAX_LOOKUPS:
+                return SPFPolicy(None, lookups, "permerror")
+
+        if qualifier is None and redirect:
+            lookups += 1
+            if "%" not in redirect:
+                child = self.policy(redirect, stack, resolve)
+                if child.error:
+                    return SPFPolicy(None, lookups, "temperror" if child.error == "temperror" else "permerror")
+                lookups += child.lookups
+                qualifier = child.qualifier
+
+        if lookups > MAX_LOOKUPS:
+            return SPFPolicy(None, lookups, "permerror")
+        return SPFPolicy(qualifier, lookups, None)
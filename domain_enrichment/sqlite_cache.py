@@ -0,0 +1,27 @@
+import os
+import sqlite3
+import threading
+
+
+def cache_path(env_var, default):
+    """Return the cache file named by env_var (default if unset), or None when it is empty or "off"."""
+    path = os.getenv(env_var, default)
+    if not path or path.lower() == "off":
+        return None
+    return path
+
+
+class SQLiteCache:
+    """One WAL-mode SQLite connection shared by every thread, creating its table on open.
+
+    Subclasses run their queries on `_conn` while holding `_lock`. Hits and
+    misses are reported through metrics.cache by each subclass.
+    """
+
+    def __init__(self, path, schema):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(schema)
+        self._conn.commit()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Streaming mode: domains flow one by one through WHOIS -> DNS -> email -> risk.
+
+Stages are connected by bounded queues and finished rows are appended to the
+output CSV as soon as they leave the risk stage, so memory stays flat no matter
+how many domains are fed in. The per-server WHOIS lanes are unbounded so a
+throttled server does not stall the others, but at most max_in_flight records
+are between the input and the output at any time. Rows are written in
+completion order, and a step that fails leaves its columns empty instead of
+dropping the row.
+
+Usage: python streaming.py <input.csv> <output.csv>
+"""
+import csv
+import sys
+from datetime import datetime
+from queue import Queue
+from threading import BoundedSemaphore, Thread
+
+from dotenv import load_dotenv
+
+load_dotenv()  # Entry point script: load .env before the stage modules read their settings
+
+from whois_checker import (
+    WHOIS_COLUMNS, WhoisServerThrottle, default_rate_per_server, fetch_whois_data, whois_server_for, whois_cache,
+)
+from dns_checker import DNS_COLUMNS, dns_cache, get_mx_records, get_spf_strict, get_dmarc_policy, live_site_prober
+from email_validator import EMAIL_COLUMNS, api_client, api_cache, email_fields
+from domain_risk_enricher import RISK_COLUMNS, detect_provider, calculate_risk_score
+from api_cache import normalize_email
+from metrics import metrics
+
+FIELDS = ["domain", "firstseen", *WHOIS_COLUMNS, *DNS_COLUMNS, *EMAIL_COLUMNS, *RISK_COLUMNS]
+
+# Marks the end of the stream on a queue
+DONE = object()
+
+
+class DomainRecord:
+    """One domain and every column the pipeline adds to it."""
+
+    __slots__ = tuple(FIELDS)
+
+    def __init__(self, domain, firstseen=None):
+        for field in FIELDS:
+            setattr(self, field, None)
+        self.domain = domain
+        self.firstseen = firstseen
+
+    def update(self, values):
+        for field, value in values.items():
+            if field in FIELDS:
+                setattr(self, field, value)
+
+    def row(self):
+        return [getattr(self, field) for field in FIELDS]
+
+
+def dns_step(record):
+    record.mx_records = get_mx_records(record.domain)
+    record.is_spf_strict = get_spf_strict(record.domain)
+    record.is_dmarc_enforced = get_dmarc_policy(record.domain)
+    record.is_live_site = live_site_prober.probe(record.domain)
+
+
+def email_step(record):
+    email = normalize_email("test@" + record.domain)
+    cached = api_cache.get_many(api_client.base_url, [email]) if api_cache is not None else {}
+    api_data = cached.get(email)
+    if api_data is None:
+        api_data = api_client.get(email=email)
+        if api_cache is not None:
+            api_cache.put_many(api_client.base_url, {email: api_data})
+    if api_data:
+        record.update(email_fields(api_data))
+    else:
+        print(f"API call failed for {email}")
+
+
+def risk_step(record):
+    record.domain_risk_level = "HIGH"
+    record.record_last_updated = datetime.now().strftime("%B, %Y")
+    record.provider_name = detect_provider(record.mx_records)
+    record.risk_score = calculate_risk_score(record.deliverability)
+
+
+def run_step(stage, step, record, *args):
+    """Run one step on a record; on any error count it and keep the record with what was filled in."""
+    try:
+        step(record, *args)
+    except Exception as e:
+        metrics.inc("stream_errors_total", stage=stage, error=type(e).__name__)
+        print(f"❌ {stage} failed for {record.domain}: {e!r}")
+
+
+def start_workers(stage, step, inbox, outbox, workers):
+    """Run `step` on records from inbox with `workers` threads, passing them on to outbox."""
+    def work():
+        while True:
+            record = inbox.get()
+            if record is DONE:
+                inbox.put(DONE)  # Let the sibling workers see it too
+                return
+            run_step(stage, step, record)
+            outbox.put(record)
+
+    def close():
+        for thread in threads:
+            thread.join()
+        outbox.put(DONE)
+
+    threads = [Thread(target=work, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    closer = Thread(target=close, daemon=True)
+    closer.start()
+    return closer
+
+
+def whois_step(record, throttle, backend):
+    whois_data = fetch_whois_data(record.domain, throttle=throttle, backend=backend)
+    if whois_cache is not None:
+        whois_cache.put_many([whois_data])
+    record.update(whois_data)
+
+
+def start_whois_router(inbox, outbox, backend, rate_per_server):
+    """Serve cached WHOIS rows directly and route the rest to one lane per WHOIS server.
+
+    Lanes are unbounded so a throttled server never stops the router from
+    feeding the others; its backlog waits in its own lane, bounded by the
+    records in flight (see stream_domains).
+    """
+    def work_lane(lane, throttle):
+        while True:
+            record = lane.get()
+            if record is DONE:
+                return
+            run_step("whois", whois_step, record, throttle, backend)
+            outbox.put(record)
+
+    def server_for(record):
+        """Return the record's WHOIS server, or None once the record was answered from the cache."""
+        cached = whois_cache.get_many([record.domain]) if whois_cache is not None else {}
+        if record.domain in cached:
+            record.update(cached[record.domain])
+            return None
+        return whois_server_for(record.domain, backend)
+
+    def route():
+        lanes = {}
+        while True:
+            record = inbox.get()
+            if record is DONE:
+                break
+            try:
+                server = server_for(record)
+            except Exception as e:
+                metrics.inc("stream_errors_total", stage="whois", error=type(e).__name__)
+                print(f"❌ whois routing failed for {record.domain}: {e!r}")
+                server = None
+            if server is None:
+                outbox.put(record)
+                continue
+            if server not in lanes:
+                lane = Queue()
+                thread = Thread(target=work_lane, args=(lane, WhoisServerThrottle(server, rate_per_server)), daemon=True)
+                thread.start()
+                lanes[server] = (lane, thread)
+            lanes[server][0].put(record)
+        for lane, _ in lanes.values():
+            lane.put(DONE)
+        for _, thread in lanes.values():
+            thread.join()
+        outbox.put(DONE)
+
+    router = Thread(target=route, daemon=True)
+    router.start()
+    return router
+
+
+def stream_domains(records, output_path, queue_size=100, dns_workers=32, email_workers=4,
+                   backend="rdap", rate_per_server=None, max_in_flight=1000):
+    """Push DomainRecords through every stage and append finished rows to output_path.
+
+    At most max_in_flight records are read ahead of the writer, so a throttled
+    WHOIS server's lane cannot soak up the whole input.
+    """
+    print("🏁 Streaming enrichment")
+    rate_per_server = rate_per_server or default_rate_per_server()
+    queues = [Queue(maxsize=queue_size) for _ in range(5)]
+    source, after_whois, after_dns, after_email, finished = queues
+    in_flight = BoundedSemaphore(max_in_flight)
+
+    def feed():
+        for record in records:
+            in_flight.acquire()  # Released once the record's row is written
+            source.put(record)
+        source.put(DONE)
+
+    Thread(target=feed, daemon=True).start()
+    start_whois_router(source, after_whois, backend, rate_per_server)
+    start_workers("dns", dns_step, after_whois, after_dns, dns_workers)
+    start_workers("email", email_step, after_dns, after_email, email_workers)
+    start_workers("risk", risk_step, after_email, finished, 1)
+
+    count = 0
+    tracker = metrics.tracker("streaming")
+    with open(output_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        while True:
+            record = finished.get()
+            if record is DONE:
+                break
+            writer.writerow(record.row())
+            f.flush()
+            in_flight.release()
+            count += 1
+            tracker.advance()
+
+    if dns_cache is not None:
+        dns_cache.flush()  # Commit the answers of the last batch
+    api_client.report()
+    print(f"✅ Streaming enrichment: {count} rows written to {output_path}")
+    return count
+
+
+def iter_csv_records(path):
+    """Yield a DomainRecord per row of a CSV with a `domain` column, reading lazily."""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("domain"):
+                yield DomainRecord(row["domain"].strip(), row.get("firstseen") or None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    stream_domains(iter_csv_records(sys.argv[1]), sys.argv[2])
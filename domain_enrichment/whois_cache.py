@@ -0,0 +1,95 @@
+import json
+import time
+from datetime import datetime, timezone
+
+from metrics import metrics
+from sqlite_cache import SQLiteCache, cache_path
+
+DAY = 86400
+
+
+def parse_day(value):
+    """Convert a YYYY-MM-DD string to a UTC timestamp, or None."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class WhoisResultCache(SQLiteCache):
+    """On-disk store of fetch_whois_data results keyed by domain.
+
+    A record is refetched after `ttl` days. The ttl starts at `base_days` and
+    doubles (up to `max_days`) every time a refetch finds the same last_updated
+    date, so stable records are checked less and less often. Records whose
+    expiration_date is within `expiry_margin_days` are refetched after
+    `min_days`. Failed lookups (a dict with only "domain") are kept for
+    `negative_hours`.
+    """
+
+    def __init__(self, path="whois_cache.sqlite3", base_days=7, max_days=90, min_days=1,
+                 expiry_margin_days=7, negative_hours=6):
+        super().__init__(path, """CREATE TABLE IF NOT EXISTS whois_results (
+            domain TEXT PRIMARY KEY,
+            record TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            ttl_days REAL NOT NULL,
+            refresh_at REAL NOT NULL
+        )""")
+        self.base_days = base_days
+        self.max_days = max_days
+        self.min_days = min_days
+        self.expiry_margin_days = expiry_margin_days
+        self.negative_hours = negative_hours
+
+    def get_many(self, domains, chunk_size=500):
+        """Return {domain: record} for every domain with a fresh cached record."""
+        domains = list(dict.fromkeys(domains))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(domains), chunk_size):
+                chunk = domains[start:start + chunk_size]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT domain, record FROM whois_results WHERE refresh_at > ? AND domain IN ({placeholders})",
+                    [now, *chunk],
+                ).fetchall()
+                found.update((domain, json.loads(record)) for domain, record in rows)
+        metrics.cache("whois", len(found), len(domains) - len(found))
+        return found
+
+    def refresh_at(self, record, now, ttl_days):
+        """Work out when a freshly fetched record should be fetched again."""
+        if len(record) <= 1:
+            return now + self.negative_hours * 3600
+        refresh = now + ttl_days * DAY
+        expiration = parse_day(record.get("expiration_date"))
+        if expiration:
+            refresh = min(refresh, max(expiration - self.expiry_margin_days * DAY, now + self.min_days * DAY))
+        return refresh
+
+    def put_many(self, records):
+        """Store freshly fetched records, growing the ttl of records whose last_updated did not change."""
+        now = time.time()
+        with self._lock:
+            for record in records:
+                domain = record["domain"]
+                ttl_days = self.base_days
+                previous = self._conn.execute(
+                    "SELECT record, ttl_days FROM whois_results WHERE domain = ?", (domain,)
+                ).fetchone()
+                if previous and len(record) > 1:
+                    last_updated = json.loads(previous[0]).get("last_updated")
+                    if last_updated and last_updated == record.get("last_updated"):
+                        ttl_days = min(previous[1] * 2, self.max_days)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO whois_results (domain, record, fetched_at, ttl_days, refresh_at) VALUES (?, ?, ?, ?, ?)",
+                    (domain, json.dumps(record), now, ttl_days, self.refresh_at(record, now, ttl_days)),
+                )
+            self._conn.commit()
+
+def open_default_cache():
+    """Open the cache configured by WHOIS_CACHE_PATH, or None if disabled."""
+    path = cache_path("WHOIS_CACHE_PATH", "whois_cache.sqlite3")
+    return WhoisResultCache(path) if path else None
@@ -1,10 +1,18 @@
 import pandas as pd
 import whois
-import time
 import random
 import requests
 from datetime import datetime, timezone
 import socket
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from rate_limiter import TokenBucket, Backoff
+from rdap_client import RDAPClient, rdap_to_record
+from whois_cache import open_default_cache
+from metrics import metrics
+from domain_status import dead_domains, skipped
 
 # Load CSV file
 # df = pd.read_csv("second_pass/df_10.csv")  # Replace with your actual file
@@ -18,6 +26,80 @@ USER_AGENTS = [
 session = requests.Session()
 session.headers.update({"User-Agent": random.choice(USER_AGENTS)})
 
+# RDAP backend sharing the pooled session above
+rdap_client = RDAPClient(session)
+
+# Persistent store of past results, consulted before any network lookup
+whois_cache = open_default_cache()
+
+# Columns added by enrich_whois_df
+WHOIS_COLUMNS = [
+    "registration_date", "last_updated", "expiration_date",
+    "registrar_name", "registrar_email", "registrar_url",
+]
+
+# Registry WHOIS servers shared by several TLDs; anything else falls back to whois.nic.<tld>
+WHOIS_SERVERS = {
+    "com": "whois.verisign-grs.com",
+    "net": "whois.verisign-grs.com",
+    "cc": "ccwhois.verisign-grs.com",
+    "tv": "tvwhois.verisign-grs.com",
+    "org": "whois.publicinterestregistry.org",
+    "info": "whois.identity.digital",
+    "mobi": "whois.identity.digital",
+    "pro": "whois.identity.digital",
+    "io": "whois.nic.io",
+    "ru": "whois.tcinet.ru",
+    "su": "whois.tcinet.ru",
+    "xn--p1ai": "whois.tcinet.ru",
+    "uk": "whois.nic.uk",
+    "de": "whois.denic.de",
+    "fr": "whois.nic.fr",
+    "nl": "whois.domain-registry.nl",
+    "eu": "whois.eu",
+    "pl": "whois.dns.pl",
+    "cn": "whois.cnnic.cn",
+    "jp": "whois.jprs.jp",
+    "br": "whois.registro.br",
+    "in": "whois.registry.in",
+}
+
+def whois_server_for(domain, backend="whois"):
+    """Return the authoritative WHOIS (or RDAP) server used to group a domain for scheduling."""
+    if backend == "rdap":
+        rdap_host = rdap_client.server_host(domain)
+        if rdap_host:
+            return rdap_host
+    tld = domain.rstrip(".").rsplit(".", 1)[-1].lower()
+    return WHOIS_SERVERS.get(tld, f"whois.nic.{tld}")
+
+
+def default_rate_per_server():
+    """Queries per second allowed against each WHOIS/RDAP server, read when a run starts."""
+    return float(os.getenv("WHOIS_RATE_PER_SERVER", "0.5"))
+
+
+class WhoisServerThrottle:
+    """Token bucket and backoff for a single WHOIS server."""
+
+    def __init__(self, server, rate=0.5):
+        self.server = server
+        self.bucket = TokenBucket(rate)
+        self.backoff = Backoff(base=30, maximum=300)
+
+    def wait(self):
+        waited = self.bucket.acquire()
+        metrics.slept(waited, "whois", self.server, "rate_limit")
+        return waited
+
+    def rate_limited(self):
+        delay = self.backoff.next_delay()
+        print(f"Rate limit hit on {self.server}. Pausing it for {delay:.0f} seconds...")
+        self.bucket.pause(delay)
+
+    def succeeded(self):
+        self.backoff.reset()
+
 def safe_parse_date(date_value):
     """Ensure the date is a datetime object, converting from string if needed."""
     if isinstance(date_value, list):  # If it's a list, process each item
@@ -38,78 +120,188 @@ def safe_parse_date(date_value):
 
     return None  # Return None for unexpected values
 
-def fetch_whois_data(domain, retries=5, delay_range=(2, 5)):
-    """Fetch WHOIS data using the whois library with retries and random delays."""
+def fetch_rdap_data(domain, retries=5, delay_range=(2, 5), throttle=None):
+    """Fetch registration data over RDAP with retries, returning the same fields as WHOIS."""
+    server = throttle.server if throttle else rdap_client.server_host(domain)
     for attempt in range(1, retries + 1):
-        try:
-            w = whois.whois(domain)
-            registration_date = safe_parse_date(w.creation_date)
-            last_updated = safe_parse_date(w.updated_date)
-            expiration_date = safe_parse_date(w.expiration_date)
-            registrar_name = w.registrar
-            # Prioritize registrar_email, fallback to emails
-            registrar_email = w.registrar_email if hasattr(w, 'registrar_email') and w.registrar_email else None
-            if not registrar_email:
-                registrar_email = w.emails[0] if isinstance(w.emails, list) else w.emails
-            
-            registrar_url = f"https://{registrar_email.split('@')[-1]}" if registrar_email else None
+        if throttle:
+            throttle.wait()
+        wait = 0
+        with metrics.call("rdap", server) as call:
+            try:
+                data = rdap_client.lookup(domain)
+                if throttle:
+                    throttle.succeeded()
+                return rdap_to_record(domain, data)
+            except requests.HTTPError as e:
+                status = e.response.status_code
+                call.outcome = f"http_{status}"
+                if status == 404:
+                    call.outcome = "not_found"
+                    return {"domain": domain}
+                if status == 429:
+                    call.outcome = "rate_limited"
+                    if throttle:
+                        throttle.rate_limited()
+                    else:
+                        retry_after = e.response.headers.get("Retry-After", "")
+                        wait = int(retry_after) if retry_after.isdigit() else 300
+                        print(f"Rate limit hit. Waiting for {wait} seconds before retrying...")
+                else:
+                    print(f"RDAP error {status} fetching data for {domain}")
+            except (requests.RequestException, ValueError) as e:
+                call.outcome = "error"
+                print(f"Unexpected error fetching RDAP data for {domain}: {e}")
+        metrics.sleep(wait, "rdap", server, "rate_limit")
+
+        if attempt < retries:
+            metrics.retry("rdap", server)
+            metrics.sleep(random.uniform(*delay_range), "rdap", server, "retry")
+
+    print(f"Skipping {domain} after {retries} failed attempts.")
+    return {"domain": domain}
+
+def fetch_whois_data(domain, retries=5, delay_range=(2, 5), throttle=None, backend="whois"):
+    """Fetch WHOIS data using the whois library with retries and random delays.
+
+    When a WhoisServerThrottle is given, every attempt waits for its token bucket
+    and rate limits pause only that server instead of sleeping for 5 minutes.
+    With backend="rdap" the lookup goes over RDAP, falling back to port-43 WHOIS
+    only for TLDs that have no RDAP service in the IANA bootstrap file.
+    """
+    if backend == "rdap" and rdap_client.server_for(domain):
+        return fetch_rdap_data(domain, retries, delay_range, throttle)
+
+    server = throttle.server if throttle else whois_server_for(domain)
+    for attempt in range(1, retries + 1):
+        if throttle:
+            throttle.wait()
+        wait = 0
+        with metrics.call("whois", server) as call:
+            try:
+                w = whois.whois(domain)
+                registration_date = safe_parse_date(w.creation_date)
+                last_updated = safe_parse_date(w.updated_date)
+                expiration_date = safe_parse_date(w.expiration_date)
+                registrar_name = w.registrar
+                # Prioritize registrar_email, fallback to emails
+                registrar_email = w.registrar_email if hasattr(w, 'registrar_email') and w.registrar_email else None
+                if not registrar_email:
+                    registrar_email = w.emails[0] if isinstance(w.emails, list) else w.emails
             
-            return {
-                "domain": domain,
-                "registration_date": registration_date.strftime("%Y-%m-%d") if registration_date else None,
-                "last_updated": last_updated.strftime("%Y-%m-%d") if last_updated else None,
-                "expiration_date": expiration_date.strftime("%Y-%m-%d") if expiration_date else None,
-                "registrar_name": registrar_name,
-                "registrar_email": registrar_email,
-                "registrar_url": registrar_url
-            }
-        except whois.parser.PywhoisError:
-            return {"domain": domain}
-        except socket.timeout:
-            print(f"Timeout error fetching WHOIS data for {domain}")
-            return {"domain": domain}
+                registrar_url = f"https://{registrar_email.split('@')[-1]}" if registrar_email else None
+
+                if throttle:
+                    throttle.succeeded()
+                return {
+                    "domain": domain,
+                    "registration_date": registration_date.strftime("%Y-%m-%d") if registration_date else None,
+                    "last_updated": last_updated.strftime("%Y-%m-%d") if last_updated else None,
+                    "expiration_date": expiration_date.strftime("%Y-%m-%d") if expiration_date else None,
+                    "registrar_name": registrar_name,
+                    "registrar_email": registrar_email,
+                    "registrar_url": registrar_url
+                }
+            except whois.parser.PywhoisError:
+                call.outcome = "not_found"
+                return {"domain": domain}
+            except socket.timeout:
+                call.outcome = "timeout"
+                print(f"Timeout error fetching WHOIS data for {domain}")
+                return {"domain": domain}
         
-        except socket.gaierror:
-            print(f"DNS resolution failed for {domain} (Name or service not known)")
-            return {"domain": domain}
+            except socket.gaierror:
+                call.outcome = "error"
+                print(f"DNS resolution failed for {domain} (Name or service not known)")
+                return {"domain": domain}
         
-        except ConnectionRefusedError:
-            print(f"Connection refused for {domain}")
-            return {"domain": domain}
+            except ConnectionRefusedError:
+                call.outcome = "error"
+                print(f"Connection refused for {domain}")
+                return {"domain": domain}
         
-        except ConnectionResetError:
-            print(f"Connection reset by peer for {domain}")
-            return {"domain": domain}
+            except ConnectionResetError:
+                call.outcome = "rate_limited"
+                print(f"Connection reset by peer for {domain}")
+                if throttle:
+                    throttle.rate_limited()
+                return {"domain": domain}
     
-        except Exception as e:
-            print(f"Unexpected error fetching WHOIS data for {domain}: {e}")
-            if "429" in str(e) or "Connection reset by peer" in str(e) :
-                print("Rate limit hit. Waiting for 5 minutes before retrying...")
-                time.sleep(300)  # Wait 5 minutes if rate limited
+            except Exception as e:
+                call.outcome = "error"
+                print(f"Unexpected error fetching WHOIS data for {domain}: {e}")
+                if "429" in str(e) or "Connection reset by peer" in str(e) :
+                    call.outcome = "rate_limited"
+                    if throttle:
+                        throttle.rate_limited()  # Back off this WHOIS server only
+                    else:
+                        print("Rate limit hit. Waiting for 5 minutes before retrying...")
+                        wait = 300  # Wait 5 minutes if rate limited
+        metrics.sleep(wait, "whois", server, "rate_limit")
 
         if attempt < retries:
             sleep_time = random.uniform(*delay_range)
-            time.sleep(sleep_time)
+            metrics.retry("whois", server)
+            metrics.sleep(sleep_time, "whois", server, "retry")
     
     print(f"Skipping {domain} after {retries} failed attempts.")
     return {"domain": domain}
 
 
-def enrich_whois_df(df):
+def enrich_whois_df(df, rate_per_server=None, max_servers=16, backend="whois", progress=None):
+    """Merge WHOIS fields into df, querying each WHOIS server on its own schedule.
+
+    Domains are grouped by authoritative WHOIS server. Each server is worked by
+    its own thread with a token bucket of `rate_per_server` queries per second
+    and its own backoff, so a throttled registry does not hold up the others.
+    rate_per_server defaults to WHOIS_RATE_PER_SERVER.
+    """
     print("🏁 Whois Checker")
-    data_list = []
+    rate_per_server = rate_per_server or default_rate_per_server()
+    domains = list(dict.fromkeys(df["domain"]))
 
-    for index, domain in enumerate(df["domain"], start=1):
-        whois_data = fetch_whois_data(domain)
-        data_list.append(whois_data)
-        
-        if index % 500 == 0 or index == 10:
-            print(f"Processed {index} domains...")
-        
-        time.sleep(random.uniform(1, 3))  # Short delay to avoid being flagged
+    # Fresh cached results and rows saved by an interrupted run need no lookup
+    results = whois_cache.get_many(domains) if whois_cache is not None else {}
+    if progress is not None:
+        results.update(progress.completed())
+    if results:
+        print(f"📢 {len(results)} domains served from the WHOIS cache or a previous run")
+
+    # Domains without a delegation get empty fields instead of a lookup (not cached)
+    dead = [domain for domain in dead_domains(df) if domain not in results]
+    results.update((domain, {"domain": domain}) for domain in dead)
+    skipped("whois", "whois_lookup", len(dead))
+
+    groups = defaultdict(list)
+    for domain in domains:
+        if domain not in results:
+            groups[whois_server_for(domain, backend)].append(domain)
+    print(f"📢 {sum(map(len, groups.values()))} domains across {len(groups)} WHOIS servers")
+
+    tracker = metrics.tracker("whois", total=sum(map(len, groups.values())))
+    lock = Lock()
+
+    def work_server(server, server_domains):
+        throttle = WhoisServerThrottle(server, rate=rate_per_server)
+        for domain in server_domains:
+            whois_data = fetch_whois_data(domain, throttle=throttle, backend=backend)
+            if whois_cache is not None:
+                whois_cache.put_many([whois_data])
+            if progress is not None:
+                progress.add(domain, whois_data)
+            with lock:
+                results[domain] = whois_data
+            tracker.advance()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(groups), max_servers))) as executor:
+        futures = [executor.submit(work_server, server, server_domains) for server, server_domains in groups.items()]
+        for future in futures:
+            future.result()
+    if progress is not None:
+        progress.flush()
 
-    # Convert results into DataFrame
-    whois_df = pd.DataFrame(data_list)
+    # Convert results into DataFrame, keeping the input order
+    whois_df = pd.DataFrame([results[domain] for domain in domains])
 
     # Merge with original DataFrame
     df = df.merge(whois_df, on="domain", how="left")
@@ -1,13 +1,40 @@
 import requests
-from bs4 import BeautifulSoup
 import pandas as pd
+import codecs
 import json
+import os
 import re
-import time
+import sys
 from collections import Counter
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from requests.adapters import HTTPAdapter
 import validators
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_enrichment"))
+from result_accumulator import ResultAccumulator
+from metrics import metrics
+
+# Stop reading a page after this many bytes if </head> has not shown up
+MAX_HEAD_BYTES = 64 * 1024
+MAX_WORKERS = 32
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Referer": "https://www.google.com/",
+    "DNT": "1",  # Do Not Track request header
+    "Connection": "keep-alive"
+}
+
+# Pooled session shared by all scraping threads
+session = requests.Session()
+session.headers.update(HEADERS)
+adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
 def clean_and_split_title(title):
     parts = re.split(r"[-—|:^]", title)
 
@@ -94,6 +121,69 @@ def determine_best_name(domain, names):
 
     return None  # If no match found, return None
 
+class HeadParser(HTMLParser):
+    """Incremental parser that collects <title>, og:site_name and JSON-LD names from the page head."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.og_site_name = None
+        self.schema_name = None
+        self.done = False
+        self._in_title = False
+        self._title_parts = []
+        self._in_ld_json = False
+        self._ld_json_parts = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "title" and self.title is None:
+            self._in_title = True
+        elif tag == "meta" and attrs.get("property") == "og:site_name" and self.og_site_name is None:
+            self.og_site_name = attrs.get("content")
+        elif tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+            self._in_ld_json = True
+            self._ld_json_parts = []
+        elif tag == "body":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._title_parts.append(data)
+        elif self._in_ld_json:
+            self._ld_json_parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            self.title = "".join(self._title_parts).strip()
+        elif tag == "script" and self._in_ld_json:
+            self._in_ld_json = False
+            if self.schema_name is None:
+                try:
+                    schema = json.loads("".join(self._ld_json_parts))
+                    if isinstance(schema, dict) and "name" in schema:
+                        self.schema_name = schema["name"]
+                except json.JSONDecodeError:
+                    pass
+        elif tag == "head":
+            self.done = True
+
+
+def read_head(response):
+    """Feed the response body to a HeadParser until </head> (or MAX_HEAD_BYTES) and stop downloading."""
+    parser = HeadParser()
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    received = 0
+    for chunk in response.iter_content(chunk_size=4096):
+        received += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if parser.done or received >= MAX_HEAD_BYTES:
+            break
+    response.close()
+    return parser
+
+
 # Function to scrape website information and return only the best match
 def scrape_website_info(domain):
 
@@ -103,17 +193,8 @@ def scrape_website_info(domain):
         print(f"Skipping invalid domain: {domain}")
         return None, "Invalid Domain"
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept-Encoding": "gzip, deflate, br",
-        "Referer": "https://www.google.com/",
-        "DNT": "1",  # Do Not Track request header
-        "Connection": "keep-alive"
-    }
-
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, timeout=(5, 10), stream=True)
         response.raise_for_status()  # Raise error if request fails
         scraping_status_code = response.status_code
     except requests.exceptions.RequestException:
@@ -123,65 +204,50 @@ def scrape_website_info(domain):
     # Ensure the response is HTML
     content_type = response.headers.get("Content-Type", "")
     if "text/html" not in content_type:
+        response.close()
         return None, "Invalid Content-Type"
 
     try:
-        soup = BeautifulSoup(response.text, "html.parser")
+        parser = read_head(response)
 
-        # Extract <title> tag and split into parts
-        title_tag = soup.find("title")
-        website_title = title_tag.text.strip() if title_tag else None
+        # Split the <title> tag into parts
+        website_title = parser.title or None
         title_parts = clean_and_split_title(website_title) if website_title else []
 
-        # Extract Open Graph <meta property="og:site_name">
-        og_tag = soup.find("meta", property="og:site_name")
-        website_og = og_tag["content"] if og_tag else None
-
-        # Extract JSON-LD schema name
-        website_schema = None
-        for script in soup.find_all("script", type="application/ld+json"):
-            try:
-                schema = json.loads(script.string)
-                if isinstance(schema, dict) and "name" in schema:
-                    website_schema = schema["name"]
-                    break
-            except json.JSONDecodeError:
-                continue
-
-        # Determine best site name
+        # Determine best site name from the title, Open Graph site name and JSON-LD schema name
         names = {
             "website_title_parts": title_parts,
-            "website_og": website_og,
-            "website_schema": website_schema
+            "website_og": parser.og_site_name,
+            "website_schema": parser.schema_name
         }
         return determine_best_name(domain, names), scraping_status_code
-    
+
     except Exception as e:
         print(f"Unexpected error for {domain}: {e}")
         return None, "Exception"
 
 
-# Load CSV file with domains
-df = pd.read_csv("df_test2.csv")  # Assuming a CSV with a "domain" column
+def enrich_org_names(input_path="df_test2.csv", output_path="df_test2-ready.csv"):
+    """Scrape the best site name of every domain in input_path and write the result to output_path."""
+    df = pd.read_csv(input_path)  # Assuming a CSV with a "domain" column
 
-# Add the new column for best match
-df["best_site_name"] = None
-df["scraping_status_code"] = None
+    print(f"Analyzing {input_path}")
+    results = ResultAccumulator(["best_site_name", "scraping_status_code"], size=len(df))
+    tracker = metrics.tracker("org_names", total=len(df))
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for i, (best_name, status_code) in enumerate(executor.map(scrape_website_info, df["domain"]), start=1):
+            results.set(i - 1, {"best_site_name": best_name, "scraping_status_code": status_code})
+            tracker.advance()
 
-print("Analyzing df_test2.csv")
-for i, (index, row) in enumerate(df.iterrows(), start=1):  # Ensure proper iteration
-    domain = row["domain"]  # Extract domain correctly
-    best_name, status_code = scrape_website_info(domain)
-    df.at[index, "best_site_name"] = best_name
-    df.at[index, "scraping_status_code"] = status_code
+    # Add the best match columns
+    df = results.attach(df)
 
-    # Print progress every 500 rows
-    if i % 500 == 0 or i == 10:
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"📢 {current_time} - Processed {i} rows")
+    # Save updated dataframe with the appended column
+    df.to_csv(output_path, index=False)
 
+    print(f"✅ Scraping complete. Results saved to {output_path}.")
+    return df
 
-# Save updated dataframe with the appended column
-df.to_csv("df_test2-ready.csv", index=False)
 
-print("✅ Scraping complete. Results saved to df_test2-ready.csv.")
\ No newline at end of file
+if __name__ == "__main__":
+    enrich_org_names()
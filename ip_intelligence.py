@@ -1,77 +1,154 @@
+import os
+import sys
 import pandas as pd
-import requests
-import time
-
-# Load the CSV file containing IP addresses
-df = pd.read_csv("ips_to_enrich.csv")
-
-# API URL and key
-api_url = "https://ip-intelligence.abstractapi.com/v1/?api_key=API_KEY&ip_address="
-
-# Function to get IP intelligence data
-def get_ip_intelligence(ip):
-    response = requests.get(api_url + ip)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return None
-
-# Iterate over the DataFrame and call the API
-print("Analyzing ips_to_enrich.csv")
-for index, row in df.iterrows():
-    ip = row['ip_address']
-    api_data = get_ip_intelligence(ip)
-    
-    if api_data:
-        # Append security fields
-        security = api_data.get('security', {})
-        df.loc[index, 'is_vpn'] = security.get('is_vpn', '')
-        df.loc[index, 'is_proxy'] = security.get('is_proxy', '')
-        df.loc[index, 'is_tor'] = security.get('is_tor', '')
-        df.loc[index, 'is_hosting'] = security.get('is_hosting', '')
-        df.loc[index, 'is_relay'] = security.get('is_relay', '')
-        df.loc[index, 'is_mobile'] = security.get('is_mobile', '')
-        df.loc[index, 'is_abuse'] = security.get('is_abuse', '')
-
-        # Append ASN and company fields
-        asn = api_data.get('asn', {})
-        df.loc[index, 'asn'] = asn.get('asn', '')
-        df.loc[index, 'asn_name'] = asn.get('name', '')
-        df.loc[index, 'asn_domain'] = asn.get('domain', '')
-        df.loc[index, 'asn_type'] = asn.get('type', '')
-
-        company = api_data.get('company', {})
-        df.loc[index, 'company_name'] = company.get('name', '')
-        df.loc[index, 'company_domain'] = company.get('domain', '')
-        df.loc[index, 'company_type'] = company.get('type', '')
-
-        # Append location fields
-        location = api_data.get('location', {})
-        df.loc[index, 'city'] = location.get('city', '')
-        df.loc[index, 'region'] = location.get('region', '')
-        df.loc[index, 'country'] = location.get('country', '')
-        df.loc[index, 'country_code'] = location.get('country_code', '')
-        df.loc[index, 'continent'] = location.get('continent', '')
-        df.loc[index, 'longitude'] = location.get('longitude', '')
-        df.loc[index, 'latitude'] = location.get('latitude', '')
-
-        # Append timezone and currency info
-        timezone = api_data.get('timezone', {})
-        df.loc[index, 'timezone'] = timezone.get('name', '')
-        df.loc[index, 'local_time'] = timezone.get('local_time', '')
-
-        currency = api_data.get('currency', {})
-        df.loc[index, 'currency'] = currency.get('code', '')
-    else:
-        print(f"API call failed for {ip}")
-
-    # Print progress every 200 rows
-    if (index + 1) % 200 == 0:
-        print(f"Processed {index + 1} rows out of {len(df)} rows.")
-
-    # Rate limit: 2 requests per second
-    time.sleep(0.5)
-
-# Display the updated DataFrame
-print("✅ Results saved to company_ips_ready-ready.csv")
-df.to_csv("ips_to_enrich-ready.csv", index=False)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_enrichment"))
+from abstract_api_client import IP_INTELLIGENCE_URL, client_from_env
+from result_accumulator import ResultAccumulator
+from api_cache import open_default_cache, normalize_ip, fetch_unique, fan_out
+from ip_range_db import IPRangeDatabase, OFFLINE_COLUMNS
+from ip_prefix_index import PrefixIndex, NETWORK_COLUMNS, is_valid_ip, is_bogon, bogon_fields, network_for, default_prefix
+
+IP_COLUMNS = [
+    'is_vpn', 'is_proxy', 'is_tor', 'is_hosting', 'is_relay', 'is_mobile', 'is_abuse',
+    'asn', 'asn_name', 'asn_domain', 'asn_type',
+    'company_name', 'company_domain', 'company_type',
+    'city', 'region', 'country', 'country_code', 'continent', 'longitude', 'latitude',
+    'timezone', 'local_time', 'currency',
+]
+
+def ip_fields(api_data):
+    """Extract the columns appended to the DataFrame from an API response."""
+    # Security fields
+    security = api_data.get('security', {})
+    # ASN and company fields
+    asn = api_data.get('asn', {})
+    company = api_data.get('company', {})
+    # Location fields
+    location = api_data.get('location', {})
+    # Timezone and currency info
+    timezone = api_data.get('timezone', {})
+    currency = api_data.get('currency', {})
+    return {
+        'is_vpn': security.get('is_vpn', ''),
+        'is_proxy': security.get('is_proxy', ''),
+        'is_tor': security.get('is_tor', ''),
+        'is_hosting': security.get('is_hosting', ''),
+        'is_relay': security.get('is_relay', ''),
+        'is_mobile': security.get('is_mobile', ''),
+        'is_abuse': security.get('is_abuse', ''),
+        'asn': asn.get('asn', ''),
+        'asn_name': asn.get('name', ''),
+        'asn_domain': asn.get('domain', ''),
+        'asn_type': asn.get('type', ''),
+        'company_name': company.get('name', ''),
+        'company_domain': company.get('domain', ''),
+        'company_type': company.get('type', ''),
+        'city': location.get('city', ''),
+        'region': location.get('region', ''),
+        'country': location.get('country', ''),
+        'country_code': location.get('country_code', ''),
+        'continent': location.get('continent', ''),
+        'longitude': location.get('longitude', ''),
+        'latitude': location.get('latitude', ''),
+        'timezone': timezone.get('name', ''),
+        'local_time': timezone.get('local_time', ''),
+        'currency': currency.get('code', ''),
+    }
+
+def network_fields(api_data):
+    """The subset of ip_fields that can be reused for other addresses in the same network."""
+    fields = ip_fields(api_data)
+    return {column: fields[column] for column in NETWORK_COLUMNS}
+
+def enrich_from_api(df, api_client, api_cache):
+    """Add IP_COLUMNS from the API, answering bogons and known prefixes locally."""
+    ips = [normalize_ip(ip) for ip in df['ip_address']]
+    unique_ips = list(dict.fromkeys(ips))
+
+    # Private and reserved addresses are answered locally, without an API call
+    invalid = {ip for ip in unique_ips if not is_valid_ip(ip)}
+    bogons = {ip for ip in unique_ips if ip not in invalid and is_bogon(ip)}
+    candidates = [ip for ip in unique_ips if ip not in bogons and ip not in invalid]
+
+    # Exact matches from past runs first, then the networks they belong to
+    responses = api_cache.get_many(api_client.base_url, candidates) if api_cache is not None else {}
+    prefix_index = PrefixIndex(max_age_days=api_cache.ttl_days if api_cache is not None else 30)
+    if api_cache is not None:
+        for ip, api_data, fetched_at in api_cache.items(api_client.base_url):
+            prefix_index.insert(network_for(ip, api_data), network_fields(api_data), fetched_at)
+
+    # Fetch one address per network first so the rest can reuse its answer
+    pending = [ip for ip in candidates if ip not in responses]
+    representatives = list({default_prefix(ip): ip for ip in reversed(pending)}.values())
+    prefix_hits = {}
+    for batch in (representatives, pending):
+        to_fetch = []
+        for ip in batch:
+            if ip in responses or ip in prefix_hits:
+                continue
+            hit = prefix_index.lookup(ip)
+            if hit is not None:
+                prefix_hits[ip] = hit
+            else:
+                to_fetch.append(ip)
+        for ip, api_data in fetch_unique(api_client, "ip_address", to_fetch, api_cache).items():
+            responses[ip] = api_data
+            if api_data:
+                prefix_index.insert(network_for(ip, api_data), network_fields(api_data))
+
+    print(f"📢 {len(bogons)} bogon addresses, {len(prefix_hits)} resolved from known prefixes, {len(responses)} from the API or cache")
+
+    records = ResultAccumulator(IP_COLUMNS + ['ip_source'])
+    for ip in unique_ips:
+        if ip in bogons:
+            records.add(ip, {**bogon_fields(), 'ip_source': 'bogon'})
+        elif responses.get(ip):
+            records.add(ip, {**ip_fields(responses[ip]), 'ip_source': 'api'})
+        elif ip in prefix_hits:
+            records.add(ip, {**prefix_hits[ip], 'ip_source': 'prefix'})
+        elif ip in invalid:
+            print(f"Skipping invalid IP address: {ip}")
+        else:
+            print(f"API call failed for {ip}")
+
+    df = fan_out(df, ips, records)
+    return df
+
+def fill_from_range_db(df, range_db):
+    """Fill the ASN/geo columns from the offline range database, keeping API values it cannot answer."""
+    offline = range_db.lookup(df['ip_address'])
+    offline.index = df.index
+    for column in OFFLINE_COLUMNS:
+        df[column] = offline[column].combine_first(df[column]) if column in df.columns else offline[column]
+    print(f"📢 Range database answered {int(offline['asn'].notna().sum())} of {len(df)} rows")
+    return df
+
+def enrich_ips(input_path="ips_to_enrich.csv", output_path="ips_to_enrich-ready.csv"):
+    """Enrich the ip_address column of input_path and write the result to output_path."""
+    df = pd.read_csv(input_path)
+
+    # API key and shared rate-limited client
+    api_client = client_from_env(IP_INTELLIGENCE_URL, "API_KEY", name="IP intelligence API")
+
+    # Also the source of the prefix index built in enrich_from_api
+    api_cache = open_default_cache()
+
+    # Optional offline ASN/geo database (see ip_range_db.py); with IP_OFFLINE_ONLY=1 the API is skipped
+    range_db = IPRangeDatabase(os.getenv("IP_RANGE_DB")) if os.getenv("IP_RANGE_DB") else None
+    offline_only = os.getenv("IP_OFFLINE_ONLY") == "1" and range_db is not None
+
+    print(f"Analyzing {input_path}")
+    if not offline_only:
+        df = enrich_from_api(df, api_client, api_cache)
+    if range_db is not None:
+        df = fill_from_range_db(df, range_db)
+
+    api_client.report()
+
+    print(f"✅ Results saved to {output_path}")
+    df.to_csv(output_path, index=False)
+    return df
+
+if __name__ == "__main__":
+    enrich_ips()
@@ -0,0 +1,103 @@
+import ipaddress
+import time
+
+DAY = 86400
+
+# Prefix assumed for a resolved address when the API response names no network
+DEFAULT_PREFIX = {4: 24, 6: 48}
+
+# Columns that describe the network rather than the single address
+NETWORK_COLUMNS = [
+    'asn', 'asn_name', 'asn_domain', 'asn_type',
+    'company_name', 'company_domain', 'company_type',
+    'city', 'region', 'country', 'country_code', 'continent', 'longitude', 'latitude',
+    'timezone', 'currency',
+]
+
+SECURITY_COLUMNS = ['is_vpn', 'is_proxy', 'is_tor', 'is_hosting', 'is_relay', 'is_mobile', 'is_abuse']
+
+
+def is_valid_ip(ip):
+    try:
+        ipaddress.ip_address(ip)
+        return True
+    except ValueError:
+        return False
+
+
+def is_bogon(ip):
+    """True for private, shared, reserved, loopback, link-local and multicast addresses."""
+    address = ipaddress.ip_address(ip)
+    return not address.is_global or address.is_multicast
+
+
+def bogon_fields():
+    """Fields written for a bogon address: every security flag False, everything else empty."""
+    return {column: False for column in SECURITY_COLUMNS}
+
+
+def network_for(ip, api_data):
+    """Return the network a response applies to, from the response or the default prefix length."""
+    address = ipaddress.ip_address(ip)
+    asn = api_data.get('asn') or {}
+    for candidate in (api_data.get('network'), asn.get('route'), asn.get('network')):
+        if not candidate:
+            continue
+        try:
+            network = ipaddress.ip_network(candidate, strict=False)
+        except ValueError:
+            continue
+        if address in network:
+            return network
+    return ipaddress.ip_network(f"{ip}/{DEFAULT_PREFIX[address.version]}", strict=False)
+
+
+def default_prefix(ip):
+    """Return the default-length prefix containing ip, used to pick one address per network."""
+    address = ipaddress.ip_address(ip)
+    return ipaddress.ip_network(f"{ip}/{DEFAULT_PREFIX[address.version]}", strict=False)
+
+
+class PrefixIndex:
+    """Binary radix trie of resolved networks with longest-prefix lookup.
+
+    Each node is [zero child, one child, (fields, inserted_at) or None]. Entries
+    older than `max_age_days` are ignored by lookup().
+    """
+
+    def __init__(self, max_age_days=30):
+        self.max_age = max_age_days * DAY
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    @staticmethod
+    def _bits(network_address, length, max_length):
+        value = int(network_address)
+        for position in range(length):
+            yield (value >> (max_length - 1 - position)) & 1
+
+    def insert(self, network, fields, inserted_at=None):
+        node = self.roots[network.version]
+        for bit in self._bits(network.network_address, network.prefixlen, network.max_prefixlen):
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            self.size += 1
+        node[2] = (fields, inserted_at if inserted_at is not None else time.time())
+
+    def lookup(self, ip):
+        """Return the fields of the most specific fresh network containing ip, or None."""
+        address = ipaddress.ip_address(ip)
+        oldest = time.time() - self.max_age
+        node = self.roots[address.version]
+        best = None
+        for bit in self._bits(address, address.max_prefixlen, address.max_prefixlen):
+            if node[2] is not None and node[2][1] >= oldest:
+                best = node[2][0]
+            node = node[bit]
+            if node is None:
+                return best
+        if node[2] is not None and node[2][1] >= oldest:
+            best = node[2][0]
+        return best
@@ -0,0 +1,112 @@
+"""Offline ASN/geo lookups from a local IPv4 range database.
+
+The database is built once from a sorted-range CSV (start_ip, end_ip, asn,
+asn_name, country, country_code, continent) or from an MMDB file, and stored as
+NumPy arrays that are memory-mapped on load. Whole columns of addresses are
+answered with one vectorized binary search.
+
+Usage: python ip_range_db.py <ranges.csv|file.mmdb> <output_dir>
+"""
+import csv
+import ipaddress
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+OFFLINE_COLUMNS = ['asn', 'asn_name', 'country', 'country_code', 'continent']
+
+
+def ranges_from_csv(path):
+    """Yield (start, end, attributes) from a range CSV, skipping IPv6 rows."""
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            start = ipaddress.ip_address(row['start_ip'].strip())
+            end = ipaddress.ip_address(row['end_ip'].strip())
+            if start.version != 4:
+                continue
+            yield int(start), int(end), tuple(row.get(column) or None for column in OFFLINE_COLUMNS)
+
+
+def ranges_from_mmdb(path):
+    """Yield (start, end, attributes) for the IPv4 networks of a MaxMind-style MMDB file."""
+    import maxminddb  # Only needed when converting MMDB files
+
+    with maxminddb.open_database(path) as reader:
+        for network, record in reader:
+            if network.version != 4:
+                continue
+            asn = record.get('autonomous_system_number')
+            country = record.get('country') or {}
+            continent = record.get('continent') or {}
+            attributes = (
+                str(asn) if asn else None,
+                record.get('autonomous_system_organization'),
+                (country.get('names') or {}).get('en'),
+                country.get('iso_code'),
+                (continent.get('names') or {}).get('en'),
+            )
+            yield int(network.network_address), int(network.broadcast_address), attributes
+
+
+def build_database(ranges, output_dir):
+    """Write sorted start/end arrays, an attribute index and the attribute table to output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    table = {}
+    rows = sorted((start, end, table.setdefault(attributes, len(table))) for start, end, attributes in ranges)
+    np.save(os.path.join(output_dir, "starts.npy"), np.array([row[0] for row in rows], dtype=np.uint32))
+    np.save(os.path.join(output_dir, "ends.npy"), np.array([row[1] for row in rows], dtype=np.uint32))
+    np.save(os.path.join(output_dir, "attributes.npy"), np.array([row[2] for row in rows], dtype=np.int32))
+    with open(os.path.join(output_dir, "attribute_table.json"), "w") as f:
+        json.dump([list(attributes) for attributes in sorted(table, key=table.get)], f)
+    print(f"✅ Wrote {len(rows)} ranges ({len(table)} distinct attribute sets) to {output_dir}")
+
+
+def ipv4_to_uint32(ips):
+    """Convert IPv4 strings to uint32 in one vectorized pass; also return the mask of valid rows."""
+    ips = pd.Series(list(ips), dtype="object").astype(str).str.strip()
+    parts = ips.str.extract(r"^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3})$")
+    valid = parts.notna().all(axis=1).to_numpy()
+    octets = parts.fillna(0).astype(np.uint32).to_numpy()
+    valid &= (octets <= 255).all(axis=1)
+    values = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+    return values.astype(np.uint32), valid
+
+
+class IPRangeDatabase:
+    """Memory-mapped range database built by build_database()."""
+
+    def __init__(self, directory):
+        self.starts = np.load(os.path.join(directory, "starts.npy"), mmap_mode="r")
+        self.ends = np.load(os.path.join(directory, "ends.npy"), mmap_mode="r")
+        self.attributes = np.load(os.path.join(directory, "attributes.npy"), mmap_mode="r")
+        with open(os.path.join(directory, "attribute_table.json")) as f:
+            table = json.load(f)
+        # One object array per column, indexed by attribute id
+        self.table = {
+            column: np.array([row[i] for row in table] + [None], dtype=object)
+            for i, column in enumerate(OFFLINE_COLUMNS)
+        }
+
+    def lookup(self, ips):
+        """Return a DataFrame of OFFLINE_COLUMNS for each address (None where unknown)."""
+        values, valid = ipv4_to_uint32(ips)
+        missing = len(self.table[OFFLINE_COLUMNS[0]]) - 1  # Id of the all-None row
+        if len(self.starts) == 0:
+            ids = np.full(len(values), missing)
+        else:
+            positions = np.searchsorted(self.starts, values, side="right") - 1
+            clipped = np.clip(positions, 0, None)
+            found = valid & (positions >= 0) & (values <= self.ends[clipped])
+            ids = np.where(found, self.attributes[clipped], missing)
+        return pd.DataFrame({column: self.table[column][ids] for column in OFFLINE_COLUMNS})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    source, output = sys.argv[1], sys.argv[2]
+    build_database(ranges_from_mmdb(source) if source.endswith(".mmdb") else ranges_from_csv(source), output)
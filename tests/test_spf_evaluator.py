@@ -0,0 +1,43 @@
+from spf_evaluator import SPFEvaluator
+
+DOMAIN_TXT = ['"v=spf1 include:_spf.provider.example -all"']
+
+
+class FlakyResolver:
+    """Fails the first lookup of every name, then answers from `records`."""
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def __call__(self, name):
+        self.calls.append(name)
+        if self.calls.count(name) == 1:
+            return None
+        return self.records.get(name, [])
+
+
+def test_failed_include_is_retried_by_a_later_domain():
+    resolve = FlakyResolver({"_spf.provider.example": ['"v=spf1 ip4:192.0.2.0/24 -all"']})
+    evaluator = SPFEvaluator(resolve)
+
+    assert evaluator.evaluate(DOMAIN_TXT).error == "temperror"
+    assert evaluator.missing_targets([DOMAIN_TXT]) == ["_spf.provider.example"]
+
+    policy = evaluator.evaluate(DOMAIN_TXT)
+    assert policy.error is None
+    assert policy.qualifier == "-"
+    assert policy.lookups == 1
+    assert resolve.calls == ["_spf.provider.example", "_spf.provider.example"]
+
+    evaluator.evaluate(DOMAIN_TXT)
+    assert len(resolve.calls) == 2  # Memoized once it succeeded
+
+
+def test_failed_store_is_not_memoized():
+    evaluator = SPFEvaluator(lambda name: ['"v=spf1 -all"'])
+    evaluator.store({"_spf.provider.example": None})
+
+    assert evaluator.missing_targets([DOMAIN_TXT]) == ["_spf.provider.example"]
+    assert evaluator.evaluate(DOMAIN_TXT, resolve=False).error == "temperror"
+    assert evaluator.evaluate(DOMAIN_TXT).error is None
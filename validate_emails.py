@@ -1,48 +1,57 @@
+import os
+import sys
 import pandas as pd
-import requests
-import time
-
-df = pd.read_csv("company_emails.csv")
-
-# API URL and key
-api_url = "https://emailvalidation.abstractapi.com/v1/?api_key=API_KEY&email="
-
-# Function to get email validation data
-def get_email_validation(email):
-    # Make the API call
-    response = requests.get(api_url + email)
-    if response.status_code == 200:
-        return response.json()  # Parse JSON response
-    else:
-        return None
-
-# Iterate over the DataFrame and call the API
-print("Analyzing company_emails.csv")
-for index, row in df.iterrows():
-    email = row['$email']
-    api_data = get_email_validation(email)
-    
-    if api_data:
-        # Extract the fields from the API response and append to the DataFrame
-        df.loc[index, 'deliverability'] = api_data.get('deliverability', '')
-        df.loc[index, 'quality_score'] = api_data.get('quality_score', '')
-        df.loc[index, 'is_valid_format'] = api_data.get('is_valid_format', {}).get('text', '')
-        df.loc[index, 'is_free_email'] = api_data.get('is_free_email', {}).get('text', '')
-        df.loc[index, 'is_disposable_email'] = api_data.get('is_disposable_email', {}).get('text', '')
-        df.loc[index, 'is_role_email'] = api_data.get('is_role_email', {}).get('text', '')
-        df.loc[index, 'is_catchall_email'] = api_data.get('is_catchall_email', {}).get('text', '')
-        df.loc[index, 'is_mx_found'] = api_data.get('is_mx_found', {}).get('text', '')
-        df.loc[index, 'is_smtp_valid'] = api_data.get('is_smtp_valid', {}).get('text', '')
-    else:
-        print(f"API call failed for {email}")
-
-    # Print progress every 200 rows
-    if (index + 1) % 200 == 0:
-        print(f"Processed {index + 1} rows out of {len(df)} rows.")
-
-    # Rate limit: 2 requests per second
-    time.sleep(0.5)
-
-# Display the updated DataFrame
-print("✅ Results saved to company_emails_processed.csv")
-df.to_csv("company_emails_ready.csv")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "domain_enrichment"))
+from abstract_api_client import EMAIL_VALIDATION_URL, client_from_env
+from result_accumulator import ResultAccumulator
+from api_cache import open_default_cache, normalize_email, fetch_unique, fan_out
+
+EMAIL_COLUMNS = [
+    'deliverability', 'quality_score', 'is_valid_format', 'is_free_email', 'is_disposable_email',
+    'is_role_email', 'is_catchall_email', 'is_mx_found', 'is_smtp_valid',
+]
+
+def validate_emails(input_path="company_emails.csv", output_path="company_emails_ready.csv"):
+    """Validate the addresses in the $email column of input_path and write the result to output_path."""
+    df = pd.read_csv(input_path)
+
+    # API key and shared rate-limited client
+    api_client = client_from_env(EMAIL_VALIDATION_URL, "API_KEY", name="Email validation API")
+
+    # Customer addresses repeat across exports; cached ones cost no API credit
+    api_cache = open_default_cache()
+
+    # Call the API once per distinct address that is not already cached
+    print(f"Analyzing {input_path}")
+    emails = [normalize_email(email) for email in df['$email']]
+    responses = fetch_unique(api_client, "email", emails, api_cache)
+
+    records = ResultAccumulator(EMAIL_COLUMNS)
+    for email, api_data in responses.items():
+        if api_data:
+            # Extract the fields from the API response
+            records.add(email, {
+                'deliverability': api_data.get('deliverability', ''),
+                'quality_score': api_data.get('quality_score', ''),
+                'is_valid_format': api_data.get('is_valid_format', {}).get('text', ''),
+                'is_free_email': api_data.get('is_free_email', {}).get('text', ''),
+                'is_disposable_email': api_data.get('is_disposable_email', {}).get('text', ''),
+                'is_role_email': api_data.get('is_role_email', {}).get('text', ''),
+                'is_catchall_email': api_data.get('is_catchall_email', {}).get('text', ''),
+                'is_mx_found': api_data.get('is_mx_found', {}).get('text', ''),
+                'is_smtp_valid': api_data.get('is_smtp_valid', {}).get('text', ''),
+            })
+        else:
+            print(f"API call failed for {email}")
+
+    df = fan_out(df, emails, records)
+
+    api_client.report()
+
+    print(f"✅ Results saved to {output_path}")
+    df.to_csv(output_path)
+    return df
+
+if __name__ == "__main__":
+    validate_emails()